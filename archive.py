@@ -0,0 +1,91 @@
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import sounding
+
+
+# parsed soundings and forecasts are kept on local disk as .npy files, so a
+# restarted worker can load them with no network round trips, and can fall
+# back to them when an upstream is down
+DIRECTORY = os.path.join(tempfile.gettempdir(), 'gliders-archive')
+
+# a forecast record per date, with the temperature of every hour
+FORECAST_DTYPE = np.dtype([('date', 'S10'), ('temp_max', '<i2'), ('hourly', '<f4', (24,))])
+
+
+def save_sounding(profile, station):
+    _save(_sounding_path(profile.source, station, profile.time), profile.levels)
+
+
+def load_sounding(source, station, time, max_age=None):
+    levels = _load(_sounding_path(source, station, time), max_age)
+    if levels is None:
+        return None
+    if levels.dtype != np.float32 or levels.shape != (len(sounding.FIELDS), len(sounding.HEIGHT)):
+        logging.warning('Ignoring archived %s sounding %s %s with shape %s', source, station, time, levels.shape)
+        return None
+    return sounding.SoundingProfile(source, time, levels)
+
+
+def save_forecast(station_id, forecast):
+    records = np.array([
+        (date, temp_max, hourly)
+        for date, (temp_max, hourly) in sorted(forecast.items())
+    ], dtype=FORECAST_DTYPE)
+    _save(_forecast_path(station_id), records)
+
+
+def load_forecast(station_id, max_age=None):
+    records = _load(_forecast_path(station_id), max_age)
+    if records is None:
+        return None
+    if records.dtype != FORECAST_DTYPE:
+        logging.warning('Ignoring archived forecast %s with dtype %s', station_id, records.dtype)
+        return None
+    return {
+        date.decode('ascii'): (int(temp_max), np.array(hourly))
+        for date, temp_max, hourly in records
+    }
+
+
+def _save(path, array):
+    # the array is written to a temporary file and renamed, so readers never
+    # see a partial file
+    directory = os.path.dirname(path)
+    _makedirs(directory)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    os.rename(tmp, path)
+
+
+def _load(path, max_age):
+    try:
+        if max_age is not None and os.path.getmtime(path) < time.time() - max_age:
+            return None
+        return np.load(path, mmap_mode='r')
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        logging.exception('Failed loading archive file %s', path)
+        return None
+
+
+def _sounding_path(source, station, time):
+    return os.path.join(DIRECTORY, source, str(station), time.strftime('%Y%m%d%H') + '.npy')
+
+
+def _forecast_path(station_id):
+    return os.path.join(DIRECTORY, 'ims', '{}.npy'.format(station_id))
+
+
+def _makedirs(directory):
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+import logging
+import sys
+from datetime import datetime
+from datetime import timedelta
+
+import history
+import stations
+import uwyo
+
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+
+def main():
+    # records the history of the noon soundings of the dates in
+    # [from, to], given as YYYY-MM-DD
+    if len(sys.argv) != 3:
+        sys.exit('Usage: {} FROM TO'.format(sys.argv[0]))
+    start, end = [datetime.strptime(arg, '%Y-%m-%d').replace(hour=12) for arg in sys.argv[1:]]
+
+    date = start
+    while date <= end:
+        try:
+            profile = uwyo.observed(date)
+        except Exception:
+            logging.exception('Failed getting the sounding of %s', date)
+            profile = None
+
+        if profile is None:
+            logging.info('%s: no sounding', date)
+        else:
+            history.record(profile, stations.all())
+            logging.info('%s: recorded', date)
+        date += timedelta(days=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+import resource
+import sys
+import timeit
+from datetime import datetime
+
+import calc
+import noaa
+import plot
+import uwyo
+
+
+_UWYO_PAGE = 'testdata/uwyo-40179-2018071012.html'
+_UWYO_TIME = datetime(2018, 7, 10, 12)
+_NOAA_TEXT = 'testdata/noaa-gfs-2018061012.txt'
+_NOAA_TIME = datetime(2018, 6, 10, 12)
+
+
+def bench_calculate():
+    data = uwyo._parse(open(_UWYO_PAGE, 'rb').read(), _UWYO_TIME)
+    _report('calc.calculate', lambda: calc.calculate(data, 32, 186), number=200)
+
+
+def bench_calculate_many():
+    data = uwyo._parse(open(_UWYO_PAGE, 'rb').read(), _UWYO_TIME)
+    n = 80
+    t0s = [30 + i % 7 for i in range(n)]
+    h0s = [i * 40 for i in range(n)]
+    _report('calc.calculate x{}'.format(n), lambda: [calc.calculate(data, t0, h0) for t0, h0 in zip(t0s, h0s)], number=10)
+    _report('calc.calculate_many x{}'.format(n), lambda: calc.calculate_many(data, t0s, h0s), number=10)
+
+
+def bench_plot():
+    data = calc.calculate(uwyo._parse(open(_UWYO_PAGE, 'rb').read(), _UWYO_TIME), 32, 186)
+    plot.render(data)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _report('plot.render', lambda: plot.render(data), number=10)
+    print('{:<40} {:12d} KB'.format('plot.render max RSS growth', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss))
+
+
+def bench_parse():
+    page = open(_UWYO_PAGE, 'rb').read()
+    text = open(_NOAA_TEXT).read()
+    _report('uwyo._parse', lambda: uwyo._parse(page, _UWYO_TIME), number=100)
+    _report('noaa._parse', lambda: noaa._parse(text, _NOAA_TIME), number=100)
+
+
+def _report(name, fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print('{:<40} {:12.1f} us/call'.format(name, best * 1e6))
+
+
+_BENCHMARKS = {
+    'calculate': bench_calculate,
+    'calculate_many': bench_calculate_many,
+    'parse': bench_parse,
+    'plot': bench_plot,
+}
+
+
+def main():
+    names = sys.argv[1:] or sorted(_BENCHMARKS)
+    for name in names:
+        _BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
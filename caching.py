@@ -0,0 +1,123 @@
+import functools
+import hashlib
+import os
+import stat
+import tempfile
+import time
+
+from beaker.cache import CacheManager
+from beaker import util
+
+
+
+
+def private_directory(name):
+    # a directory in the temp directory that only the app user can use. the
+    # files in it are unpickled or served, so a file or a link that another
+    # user could plant would run code or be read as the app user.
+    path = os.path.join(tempfile.gettempdir(), name)
+    try:
+        os.mkdir(path, 0o700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise RuntimeError('{} is not a directory of the app user'.format(path))
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+# the data caches are shared by all the worker processes on the host. beaker
+# holds a file lock while a value is created, so a single process fills a
+# key while the others wait for it, or get the expired value if they have one.
+DIRECTORY = private_directory('gliders-cache')
+
+# a read from the shared cache costs a file read, so each process keeps the
+# values it reads in memory for a short time
+LOCAL_EXPIRE = 60
+
+SHARED = CacheManager(
+    type='file',
+    data_dir=os.path.join(DIRECTORY, 'data'),
+    lock_dir=os.path.join(DIRECTORY, 'lock'),
+)
+LOCAL = CacheManager()
+
+
+def cache(name, expire):
+    def decorate(fn):
+        shared = SHARED.cache(name, expire=expire)(fn)
+        local = LOCAL.cache(name, expire=min(expire, LOCAL_EXPIRE))(shared)
+        # the last time each of the arguments was used, for the refresh
+        used = {}
+
+        @functools.wraps(fn)
+        def cached(*args):
+            used[args] = time.time()
+            return local(*args)
+
+        def refresh(since, *args):
+            # fills the value of the arguments again, while the old value is
+            # still served. the refresh is skipped if another process is
+            # filling it, or already filled it after since.
+            value = _value(SHARED, shared, expire, (name,) + args)
+            lock = value.namespace.get_creation_lock(value.key)
+            if not lock.acquire(wait=False):
+                return
+            try:
+                stored = _stored(value)
+                if stored is not None and stored >= since:
+                    return
+                result = fn(*args)
+                value.set_value(result)
+            finally:
+                lock.release()
+            _value(LOCAL, local, min(expire, LOCAL_EXPIRE), (name,) + args).set_value(result)
+
+        def put(value, *args):
+            # stores a value of the arguments that was computed along with
+            # another value
+            _value(SHARED, shared, expire, (name,) + args).set_value(value)
+            _value(LOCAL, local, min(expire, LOCAL_EXPIRE), (name,) + args).set_value(value)
+
+        def stored(*args):
+            # the time the value of the arguments was stored in the shared
+            # cache, None if it was not
+            return _stored(_value(SHARED, shared, expire, (name,) + args))
+
+        def recent():
+            # the arguments that were used since the values they got expired
+            now = time.time()
+            for args, used_at in list(used.items()):
+                if used_at < now - expire:
+                    used.pop(args, None)
+            return list(used)
+
+        cached.refresh = refresh
+        cached.put = put
+        cached.recent = recent
+        cached.stored = stored
+        return cached
+    return decorate
+
+
+def _value(manager, fn, expire, args):
+    # the beaker value of the decorated function call, the key is built like
+    # the beaker decorator builds it
+    cache = manager.get_cache(fn._arg_namespace, expire=expire)
+    key = ' '.join(str(arg) for arg in args)
+    if len(key) + len(cache.namespace_name) > util.DEFAULT_CACHE_KEY_LENGTH:
+        key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return cache._get_value(key)
+
+
+def _stored(value):
+    value.namespace.acquire_read_lock()
+    try:
+        return value._get_value()[0]
+    except KeyError:
+        return None
+    finally:
+        value.namespace.release_read_lock()
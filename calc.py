@@ -3,9 +3,11 @@ matplotlib.use("Agg")
 
 import numpy as np
 
+import sounding
+
 
 _LIM_T = -20, 40
-_LIM_H = 0, 15000
+_LIM_H = sounding.BOTTOM, sounding.TOP
 
 
 M = -3. / 1000
@@ -13,50 +15,122 @@ H_TRIGGER = 4000.
 
 
 def calculate(data, t0, h0):
-    height = np.array([hi.to('feet').m for hi in data.h if hi.to('feet').m <= _LIM_H[1]])
-    temp = np.array([ti.to('degC').m for ti in data.T[:len(height)]])
-    dew = np.array([ti.to('degC').m for ti in data.Td[:len(height)]])
+    return calculate_many(data, [t0], [h0])[0]
+
+
+def calculate_many(data, t0s, h0s):
+    height, temp, dew, wind_u, wind_v = _arrays(data)
+    batch = _batch(height, temp, dew, t0s, h0s)
+
+    return [
+        {
+            'height': height,
+            'temp': temp,
+            'dew': dew,
+            'temp_max': batch['temp_max'][i],
+            'trig': batch['trig'],
+            'cloud_base': batch['cloud_base'][i],
+            'h0': station_h0,
+            't0': station_t0,
+            'trig_0': batch['trig_0'][i],
+            'tol': batch['tol'][i],
+            'tol_minus_3': batch['tol_minus_3'][i],
+            'lim_h': _LIM_H,
+            'lim_t': _LIM_T,
+            'wind_u': wind_u,
+            'wind_v': wind_v,
+        }
+        for i, (station_t0, station_h0) in enumerate(zip(t0s, h0s))
+    ]
+
+
+def sensitivity(data, t0, h0, deltas):
+    # evaluate a single station for a range of max temperatures around t0
+    height, temp, dew, _, _ = _arrays(data)
+    t0s = t0 + np.asarray(deltas, dtype=np.float64)
+    batch = _batch(height, temp, dew, t0s, np.full_like(t0s, h0))
+
+    return {
+        't0': t0s,
+        'tol': batch['tol'],
+        'tol_minus_3': batch['tol_minus_3'],
+        'cloud_base': batch['cloud_base'],
+        'trig_0': batch['trig_0'][0],
+    }
+
+
+def timeline(data, t0s, h0):
+    # evaluate a single station for the temperatures of the hours of a day.
+    # hours without a temperature get nan.
+    height, temp, dew, _, _ = _arrays(data)
+    t0s = np.asarray(t0s, dtype=np.float64)
+    batch = _batch(height, temp, dew, t0s, np.full_like(t0s, h0))
+    missing = np.isnan(t0s)
+    trig_0 = batch['trig_0'][0]
+
+    return {
+        't0': t0s,
+        'tol': np.where(missing, np.nan, batch['tol']),
+        'tol_minus_3': np.where(missing, np.nan, batch['tol_minus_3']),
+        'cloud_base': batch['cloud_base'],
+        'trig_0': trig_0,
+        'trigger': ~missing & (t0s > trig_0),
+    }
+
+
+def _batch(height, temp, dew, t0s, h0s):
+    # the stations are the rows and the sounding levels are the columns
+    t0 = np.asarray(t0s, dtype=np.float64)[:, np.newaxis]
+    h0 = np.asarray(h0s, dtype=np.float64)[:, np.newaxis]
 
     # calculate the max temperature graph
     # this graph starts at (t0, h0) and follows the slope M
-    temp_max = [t0 + M * (hi - h0) for hi in height]
+    temp_max = t0 + M * (height - h0)
 
     # calculate the dew point in h0
-    dew_h0 = np.interp(h0, height, dew)
-
-    # calculate the cloud base
-    cloud_base = 1000.0 / 2.5 * (t0 - dew_h0) + h0
+    dew_h0 = sounding.at(dew, h0[:, 0])
 
     # calculate trigger temperature
     # trig_h is the temperature at height H_TRIGGER
-    trig_h = np.interp(H_TRIGGER, height, temp)
-    # trig is the trigger graph
-    trig = trig_h + M * (height - H_TRIGGER)
-    trig_0 = trig_h + M * (h0 - H_TRIGGER)
-
-    tol = np.interp(0, np.flip(temp_max-temp, 0), np.flip(height, 0))
+    trig_h = sounding.at(temp, H_TRIGGER)
 
-    tol_minus_3 = np.interp(0, np.flip(temp_max-temp-3, 0), np.flip(height, 0))
-
-    wind_u = np.array([ti.to('knot').m for ti in data.wind_u[:len(height)]])
-    wind_v = np.array([ti.to('knot').m for ti in data.wind_v[:len(height)]])
+    diff = temp_max - temp
 
     return {
-        'height': height,
-        'temp': temp,
-        'dew': dew,
         'temp_max': temp_max,
-        'trig': trig,
-        'cloud_base': cloud_base,
-        'h0': h0,
-        't0': t0,
-        'trig_0': trig_0,
-        'tol': tol,
-        'tol_minus_3': tol_minus_3,
-        'lim_h': _LIM_H,
-        'lim_t': _LIM_T,
-        'wind_u': wind_u,
-        'wind_v': wind_v,
+        # calculate the cloud base
+        'cloud_base': 1000.0 / 2.5 * (t0[:, 0] - dew_h0) + h0[:, 0],
+        # trig is the trigger graph, it is the same for all the stations
+        'trig': trig_h + M * (height - H_TRIGGER),
+        'trig_0': trig_h + M * (h0[:, 0] - H_TRIGGER),
+        'tol': _crossing(diff, height),
+        'tol_minus_3': _crossing(diff - 3, height),
     }
 
 
+def _crossing(diff, height):
+    # find for each row the height where diff first drops below zero, going
+    # up from the lowest level, and interpolate linearly between the two
+    # levels around it.
+    below = diff < 0
+    crossing = ~below[:, :-1] & below[:, 1:]
+    i = np.argmax(crossing, axis=1)
+    rows = np.arange(len(diff))
+    d0 = diff[rows, i]
+    d1 = diff[rows, i + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = height[i] + (height[i + 1] - height[i]) * d0 / (d0 - d1)
+
+    # rows without a crossing are either below zero from the lowest level,
+    # or never drop below zero in the sounding range
+    return np.where(
+        crossing.any(axis=1),
+        h,
+        np.where(below[:, 0], height[0], height[-1]),
+    )
+
+
+def _arrays(data):
+    # the sounding is already resampled to the fixed height grid, in the
+    # units that are used here
+    return data.h, data.T, data.Td, data.wind_u, data.wind_v
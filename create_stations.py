@@ -1,8 +1,14 @@
 #! /usr/bin/env python
-import requests
+import argparse
+import json
 import logging
+import os
 import sys
+from multiprocessing.pool import ThreadPool
 
+import numpy as np
+import requests
+from scipy import interpolate
 import yaml
 
 import ims
@@ -10,11 +16,35 @@ import ims
 
 logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
 
+_ELEVATION_URL = 'https://api.open-elevation.com/api/v1/lookup'
+
+# the elevation API accepts many locations in one request. the batches are
+# sent concurrently, over a keep alive connection pool.
+BATCH = 100
+CONCURRENCY = 4
+TIMEOUT = 30
+
+# the elevations that were already resolved, in meters, by coordinate
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'elevations.json')
+
+_FEET = 3.28084
+
+_session = requests.Session()
+_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CONCURRENCY))
+
 
 def main():
-    stations = _stations()
-    result = {}
-    for st in stations:
+    parser = argparse.ArgumentParser(description='Creates new_stations.yaml from the IMS stations')
+    parser.add_argument('--cache', default=CACHE_PATH, help='the elevations cache file')
+    parser.add_argument(
+        '--dem',
+        help='a .npz file of a lat, lon and elevation [m] grid. elevations that are not '
+             'cached are interpolated from it, with no requests to the elevation API',
+    )
+    args = parser.parse_args()
+
+    stations = []
+    for st in _stations():
         name = str(' '.join(part.capitalize() for part in st['name'].split()))
         if not st['active']:
             logging.info('Skipping - inactive: %s', name)
@@ -28,11 +58,20 @@ def main():
         if lat is None or long is None:
             logging.info('Skipping - no location: %s', name)
             continue
+        stations.append((name, st, (lat, long)))
 
-        elevation = _elevation(lat=lat, long=long)
+    elevations = _elevations([coord for _, _, coord in stations], args.cache, args.dem)
+
+    result = {}
+    for name, st, (lat, long) in stations:
+        elevation = elevations.get(_key(lat, long))
+        if elevation is None:
+            logging.info('Skipping - no elevation: %s', name)
+            continue
+        elevation *= _FEET
         logging.info('%s: found elevation %f', name, elevation)
 
-        logging.info('%s: adding to result')
+        logging.info('%s: adding to result', name)
         result[name] = {
             'id': st['stationId'],
             'elevation': elevation,
@@ -46,19 +85,95 @@ def main():
 
 
 def _stations():
-    resp = ims.session.get('https://api.ims.gov.il/v1/envista/stations')
+    resp = ims._session.get('https://api.ims.gov.il/v1/envista/stations', timeout=ims.TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
 
-def _elevation(lat, long):
-    resp = requests.get(
-        'https://api.open-elevation.com/api/v1/lookup?locations={lat},{long}'.format(lat=lat, long=long)
-    )
+def _elevations(coords, cache_path, dem_path=None):
+    # the elevations of the (lat, long) coords in meters, by their _key. the
+    # coords that are not in the cache are looked up in the DEM if it is
+    # given, and in the elevation API otherwise. the API results are added
+    # to the cache.
+    cache = _load_cache(cache_path)
+    missing = sorted(set(_key(*coord) for coord in coords) - set(cache))
+    logging.info('Elevations: %d cached, %d missing', len(coords) - len(missing), len(missing))
+    if not missing:
+        return cache
+
+    if dem_path is not None:
+        result = dict(cache)
+        result.update(_dem_elevations(dem_path, missing))
+        return result
+
+    # the cache is saved after every batch, so the batches that were resolved
+    # are kept when others fail or the run is interrupted
+    batches = [missing[i:i + BATCH] for i in range(0, len(missing), BATCH)]
+    pool = ThreadPool(min(CONCURRENCY, len(batches)))
+    try:
+        for batch in pool.imap_unordered(_try_lookup, batches):
+            if batch:
+                cache.update(batch)
+                _save_cache(cache_path, cache)
+    finally:
+        pool.close()
+        pool.join()
+    return cache
+
+
+def _try_lookup(keys):
+    try:
+        return _lookup(keys)
+    except Exception:
+        logging.exception('Failed looking up %d elevations, from %s', len(keys), keys[0])
+        return None
+
+
+def _lookup(keys):
+    locations = []
+    for key in keys:
+        lat, long = _coord(key)
+        locations.append({'latitude': lat, 'longitude': long})
+    resp = _session.post(_ELEVATION_URL, json={'locations': locations}, timeout=TIMEOUT)
     resp.raise_for_status()
-    return resp.json()['results'][0]['elevation'] * 3.28084
+    # the results are in the order of the locations
+    return dict(zip(keys, (result['elevation'] for result in resp.json()['results'])))
+
+
+def _dem_elevations(dem_path, keys):
+    # bilinear interpolation on the grid. coords out of the grid are left out.
+    dem = np.load(dem_path)
+    grid = interpolate.RegularGridInterpolator(
+        (dem['lat'], dem['lon']), dem['elevation'], bounds_error=False, fill_value=np.nan,
+    )
+    values = grid(np.array([_coord(key) for key in keys]))
+    return {key: float(value) for key, value in zip(keys, values) if not np.isnan(value)}
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, OSError):
+        return {}
+
+
+def _save_cache(path, cache):
+    # written to a temporary file and renamed, so an interrupted run does not
+    # lose the cache
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cache, f, indent=0, sort_keys=True)
+    os.rename(tmp, path)
+
+
+def _key(lat, long):
+    return '{:.6f},{:.6f}'.format(lat, long)
 
 
+def _coord(key):
+    lat, long = key.split(',')
+    return float(lat), float(long)
 
 
 _ALL_STATIONS = set([
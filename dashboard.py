@@ -0,0 +1,136 @@
+import hashlib
+import json
+import math
+import threading
+import time
+
+import caching
+import calc
+import ims
+import stations
+import timeformat
+import uwyo
+
+
+# the index page is built once per version of its inputs: the observed
+# sounding, and the max temperature and the elevation of every station. the
+# inputs are read from the caches, that are not fresher than their local
+# tier, so a snapshot is used with no check for that long.
+CHECK_PERIOD = caching.LOCAL_EXPIRE
+
+_VALUES = ('t0', 'trig_0', 'tol', 'tol_minus_3', 'cloud_base')
+
+_lock = threading.Lock()
+_snapshot = [None]
+_checked = [0]
+# the inputs and the computed values of every station, so a new version
+# computes only the stations whose inputs changed
+_rows = {}
+
+
+class Snapshot(object):
+
+    def __init__(self, version, data_time, rows, locations, html):
+        self.version = version
+        # the inputs changed at most when the snapshot was built
+        self.modified = time.time()
+        self.etag = version
+        self.data_time = data_time
+        # the inputs and the computed values of the stations of the version,
+        # the views of some of the stations are built from them
+        self.rows = rows
+        # the template values, as the index page renders them
+        self.locations = locations
+        self.html = html
+        self.json = json.dumps({
+            'version': version,
+            'data_time': timeformat.format(data_time),
+            'locations': [
+                dict(
+                    [(name, _json_value(loc['data'][name])) for name in _VALUES],
+                    name=loc['name'],
+                    elevation=loc['elevation'],
+                    triggered=bool(loc['data']['trig_0'] < loc['data']['t0']),
+                    tol_percent=_json_value(loc['tol_percent']),
+                )
+                for loc in locations
+            ],
+        }, sort_keys=True)
+
+
+def current(render, force=False):
+    # the snapshot of the current inputs. render(data_time, locations) returns
+    # the html of the page. raises uwyo.NoSoundingDataException when there is
+    # no observed sounding.
+    snapshot = _snapshot[0]
+    if not force and snapshot is not None and time.time() - _checked[0] < CHECK_PERIOD:
+        return snapshot
+
+    with _lock:
+        profile, data_time = uwyo.data()
+        names = stations.all()
+        records = [stations.get(name) for name in names]
+        ims.prefetch(records)
+        inputs = [
+            (profile.key, ims.temp_max(station), station['elevation'])
+            for station in records
+        ]
+        version = hashlib.sha1(repr(list(zip(names, inputs))).encode('utf-8')).hexdigest()
+        _checked[0] = time.time()
+
+        snapshot = _snapshot[0]
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        _update(profile, names, inputs)
+        rows = dict((name, _rows[name]) for name in names)
+        locations = locations_of(rows, names)
+        snapshot = Snapshot(version, data_time, rows, locations, render(data_time, locations))
+        _snapshot[0] = snapshot
+        return snapshot
+
+
+def locations_of(rows, names):
+    # the template values of the stations of the rows of a snapshot, the tol
+    # bar is relative to the max tol of the stations
+    locations = [
+        {
+            'name': name,
+            'selected': False,
+            'data': rows[name][1],
+            'elevation': rows[name][0][2],
+        }
+        for name in names
+    ]
+    max_tol = max([loc['data']['tol'] for loc in locations] + [0])
+    for loc in locations:
+        loc['tol_percent'] = loc['data']['tol'] / max_tol * 100 if max_tol else 0
+    return locations
+
+
+def _update(profile, names, inputs):
+    changed = [
+        (name, station_inputs)
+        for name, station_inputs in zip(names, inputs)
+        if name not in _rows or _rows[name][0] != station_inputs
+    ]
+    if changed:
+        results = calc.calculate_many(
+            profile,
+            [t0 for _, (_, t0, _) in changed],
+            [h0 for _, (_, _, h0) in changed],
+        )
+        for (name, station_inputs), result in zip(changed, results):
+            row = dict((value, float(result[value])) for value in _VALUES)
+            # the max temperature is shown as IMS forecasts it
+            row['t0'] = result['t0']
+            _rows[name] = (station_inputs, row)
+
+    for name in set(_rows) - set(names):
+        del _rows[name]
+
+
+def _json_value(value):
+    if math.isnan(value):
+        return None
+    return round(value, 1)
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+# the scalar and array values of a calc.calculate result that are sent to
+# clients, in the order of the packed binary encoding
+SCALARS = ('t0', 'h0', 'trig_0', 'tol', 'tol_minus_3', 'cloud_base')
+ARRAYS = ('height', 'temp', 'dew', 'temp_max', 'trig', 'wind_u', 'wind_v')
+LAYOUT = ','.join(SCALARS) + ';' + ','.join(ARRAYS)
+
+# number of decimals that the values are rounded to: heights to feet, and
+# temperatures and winds to a tenth
+_DECIMALS = {
+    'h0': 0,
+    'tol': 0,
+    'tol_minus_3': 0,
+    'cloud_base': 0,
+    'height': 0,
+}
+
+
+def to_json(data):
+    result = {}
+    for name in SCALARS + ARRAYS:
+        result[name] = _round(np.asarray(data[name], dtype=np.float64), _DECIMALS.get(name, 1))
+    return result
+
+
+def _round(values, decimals):
+    # values that are rounded to whole numbers are sent as integers, and nan
+    # values, such as the dew point of a missing column, are sent as null
+    missing = np.isnan(values)
+    values = np.round(np.where(missing, 0, values), decimals)
+    if decimals == 0:
+        values = values.astype(np.int64)
+    if values.ndim == 0:
+        return None if missing else values.item()
+    return [None if m else value for m, value in zip(missing.tolist(), values.tolist())]
+
+
+def to_f32(data):
+    # little endian float32 values: the scalars, followed by the arrays one
+    # after the other. all the arrays have the same length.
+    values = [np.asarray([data[name] for name in SCALARS], dtype='<f4')]
+    values += [np.asarray(data[name], dtype='<f4') for name in ARRAYS]
+    return np.concatenate(values).tobytes()
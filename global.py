@@ -1,3 +1,5 @@
+import collections
+
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
@@ -7,6 +9,9 @@ import metpy.calc as mpcalc
 from metpy.cbook import get_test_data
 from metpy.plots import add_metpy_logo, SkewT
 from metpy.units import units
+
+import sounding
+
 # GFS analysis valid for grid point 10.2 nm / 243 deg from 32.577899,35.179972:
 # GFS         12      10      Jun    2018
 #    CAPE    791    CIN   -238  Helic  99999     PW     17
@@ -52,11 +57,13 @@ from metpy.units import units
 # 5: wind direction [deg]
 # 6: wind speed [knots]
 
+_Quantities = collections.namedtuple('_Quantities', ['h', 'p', 'T', 'Td', 'wind_u', 'wind_v'])
+
 col_names = ['x', 'pressure', 'height', 'temperature', 'dewpoint', 'direction', 'speed']
 
 
 def plot_p_t(data):
-    d = _process(data)
+    d = _with_units(_process(data))
 
     fig = plt.figure()
     skew = SkewT(fig, rotation=45)
@@ -95,7 +102,7 @@ def plot_p_t(data):
 
 
 def plot_h_t(data):
-    d = _process(data)
+    d = _with_units(_process(data))
 
     fig = plt.figure()
     ax = fig.add_subplot(111)
@@ -134,17 +141,6 @@ def plot_h_t(data):
     return '/tmp/sounding.png'
 
 
-class Data:
-
-    def __init__(self, h, p, T, Td):
-        self.h = h
-        self.p = p
-        self.T = T
-        self.Td = Td
-        self.wind_u = None
-        self.wind_v = None
-
-
 def _process(data):
     df = pd.read_fwf(get_test_data(data, as_file_obj=False), skiprows=6, usecols=[1, 2, 3, 4, 5, 6], names=col_names)
 
@@ -152,16 +148,24 @@ def _process(data):
         subset=('temperature', 'dewpoint', 'direction', 'speed'),
         how='all').reset_index(drop=True)
 
-    d = Data(
-        h=df['height'].values * units.meter,
-        p=df['pressure'].values/10.0 * units.millibar,
-        T=df['temperature'].values/10.0 * units.degC,
-        Td=df['dewpoint'].values/10.0 * units.degC,
+    wind_u, wind_v = sounding.wind_components(df['speed'].values, df['direction'].values)
+
+    return sounding.SoundingProfile('gfs', None, sounding.resample(
+        height=df['height'].values * sounding.FEET_PER_METER,
+        p=df['pressure'].values / 10.0,
+        T=df['temperature'].values / 10.0,
+        Td=df['dewpoint'].values / 10.0,
+        wind_u=wind_u,
+        wind_v=wind_v,
+    ))
+
+
+def _with_units(profile):
+    return _Quantities(
+        h=profile.h * units.feet,
+        p=profile.p * units.hPa,
+        T=profile.T * units.degC,
+        Td=profile.Td * units.degC,
+        wind_u=profile.wind_u * units.knots,
+        wind_v=profile.wind_v * units.knots,
     )
-    d.h = d.h.to('feet')
-    d.wind_u, d.wind_v = mpcalc.get_wind_components(
-        df['speed'].values * units.knots,
-        df['direction'].values * units.degrees)
-
-    return d
-
@@ -0,0 +1,8 @@
+# gunicorn -c gunicorn.conf.py main:app
+
+
+def post_worker_init(worker):
+    # every worker runs its own refresh jobs and subscribers, they are
+    # started after the fork so their threads run in the worker
+    import main
+    main.start()
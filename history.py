@@ -0,0 +1,146 @@
+import contextlib
+import fcntl
+import os
+
+import numpy as np
+
+import archive
+import caching
+import calc
+import sounding
+import stations
+
+
+# the values that were computed for every sounding are kept per station, in
+# append only column files that are memory mapped for queries
+DIRECTORY = caching.private_directory('gliders-history')
+
+COLUMNS = (
+    ('time', np.dtype('<M8[h]')),
+    ('t0', np.dtype('<f4')),
+    # whether t0 is estimated from the sounding, when there was no archived
+    # IMS forecast for the date
+    ('estimated', np.dtype('u1')),
+    ('trig_0', np.dtype('<f4')),
+    ('tol', np.dtype('<f4')),
+    ('tol_minus_3', np.dtype('<f4')),
+    ('cloud_base', np.dtype('<f4')),
+)
+VALUES = ('t0', 'trig_0', 'tol', 'tol_minus_3', 'cloud_base')
+
+
+def record(profile, names):
+    # computes the values of the stations for the sounding and appends them.
+    # a sounding that was already recorded for a station is skipped.
+    t0s = [t0(profile, stations.get(name)) for name in names]
+    results = calc.calculate_many(
+        profile,
+        [temp for temp, _ in t0s],
+        [stations.get(name)['elevation'] for name in names],
+    )
+
+    time = np.datetime64(profile.time, 'h')
+    for name, (temp, estimated), result in zip(names, t0s, results):
+        with _locked(name):
+            times = _read(name)['time']
+            if time in times:
+                continue
+            _append(name, len(times), {
+                'time': time,
+                't0': temp,
+                'estimated': estimated,
+                'trig_0': result['trig_0'],
+                'tol': result['tol'],
+                'tol_minus_3': result['tol_minus_3'],
+                'cloud_base': result['cloud_base'],
+            })
+
+
+def t0(profile, station):
+    # the max temperature of the sounding date from the archived IMS forecast.
+    # if there is none, the temperature of the sounding at the station
+    # elevation, the noon sounding is close to the daily max.
+    forecast = archive.load_forecast(station['temp_max_id'])
+    date_text = profile.time.strftime('%Y-%m-%d')
+    if forecast is not None and date_text in forecast:
+        return float(forecast[date_text][0]), False
+    return float(sounding.at(profile.T, station['elevation'])), True
+
+
+def query(name, start, end):
+    # the recorded rows of a station in [start, end), ordered by time
+    columns = _read(name)
+    times = columns['time']
+    rows = np.flatnonzero((times >= np.datetime64(start, 'h')) & (times < np.datetime64(end, 'h')))
+    rows = rows[np.argsort(times[rows], kind='mergesort')]
+    return dict((column, np.asarray(values[rows])) for column, values in columns.items())
+
+
+def aggregate(name, start, end):
+    rows = query(name, start, end)
+    result = {'count': len(rows['time'])}
+    for column in VALUES:
+        values = rows[column][~np.isnan(rows[column])]
+        if len(values) == 0:
+            result[column] = None
+            continue
+        result[column] = {
+            'mean': float(values.mean()),
+            'min': float(values.min()),
+            'max': float(values.max()),
+        }
+    return result
+
+
+@contextlib.contextmanager
+def _locked(name):
+    # every worker records the soundings it is published, and the backfill
+    # records them from another process, so a station is locked across
+    # processes from the check of its rows to the append
+    directory = _directory(name)
+    _makedirs(directory)
+    with open(os.path.join(directory, 'lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _append(name, length, row):
+    directory = _directory(name)
+    for column, dtype in COLUMNS:
+        with open(os.path.join(directory, column), 'ab') as f:
+            # drop what was written of a row that was cut in the middle
+            f.truncate(length * dtype.itemsize)
+            f.write(np.array([row[column]], dtype=dtype).tobytes())
+
+
+def _read(name):
+    columns = {}
+    for column, dtype in COLUMNS:
+        path = os.path.join(_directory(name), column)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if size < dtype.itemsize:
+            columns[column] = np.empty(0, dtype=dtype)
+        else:
+            columns[column] = np.memmap(path, dtype=dtype, mode='r', shape=(size // dtype.itemsize,))
+
+    # a row that was cut in the middle of an append is ignored
+    length = min(len(values) for values in columns.values())
+    return dict((column, values[:length]) for column, values in columns.items())
+
+
+def _directory(name):
+    return os.path.join(DIRECTORY, name)
+
+
+def _makedirs(directory):
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
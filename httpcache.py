@@ -0,0 +1,72 @@
+import hashlib
+import time
+from datetime import datetime
+
+import flask
+
+import refresh
+
+
+# max age for responses whose URL identifies their content
+LONG_MAX_AGE = 7 * 24 * 60 * 60
+# max age for responses whose content may change under the same URL
+SHORT_MAX_AGE = 60
+# the time a refresh may take after it is due. responses in that time may be
+# of the data before the refresh, so they are cached for a short time.
+REFRESH_TIME = 60
+
+
+def key(*parts):
+    # a validator of the content that is determined by the parts
+    return hashlib.sha1(' '.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def conditional(resp, etag=None, last_modified=None, max_age=SHORT_MAX_AGE):
+    # set the validators and the caching policy of the response, and turn
+    # it into a 304 if the request validators match. with no etag, the etag
+    # is the hash of the response content.
+    if etag is None:
+        resp.add_etag()
+    else:
+        resp.set_etag(etag)
+    # the modification time of a sent file is when it was written, not when
+    # its data was, so it is replaced
+    if last_modified is None:
+        resp.headers.pop('Last-Modified', None)
+    else:
+        resp.last_modified = last_modified
+    resp.cache_control.no_cache = None
+    resp.cache_control.public = True
+    resp.cache_control.max_age = max_age
+    return resp.make_conditional(flask.request)
+
+
+def updated(resp, etag, periods, modified=()):
+    # a response of data that is refreshed on the periods of refresh.schedule,
+    # it may be cached until the next refresh. modified are the times its
+    # inputs were stored, the last of them is its modification time.
+    return conditional(resp, etag, last_modified(*modified), max_age(*periods))
+
+
+def uncached(resp):
+    # a response that changes on every request
+    resp.cache_control.no_cache = True
+    resp.cache_control.max_age = 0
+    return resp
+
+
+def max_age(*periods):
+    # seconds until the next refresh of the periods
+    now = time.time()
+    if any(now - refresh.due(period, now=now) < REFRESH_TIME for period in periods):
+        return SHORT_MAX_AGE
+    return max(int(min(refresh.due(period, now=now) + period for period in periods) - now), 1)
+
+
+def last_modified(*times):
+    # the last of the times, as a datetime. times that are not known are
+    # None, and then there is no modification time, the etag is the only
+    # validator.
+    if not times or None in times:
+        return None
+    return datetime.utcfromtimestamp(min(max(times), time.time()))
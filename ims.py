@@ -1,26 +1,66 @@
 import logging
+import threading
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
+import numpy as np
 import requests
-import bs4
-from beaker import cache
+
+import archive
+import caching
 
 
-CACHE = cache.CacheManager()
 _IMS_AUTH = {'Authorization': 'ApiToken 1a901e45-9028-44ff-bd2c-35e82407fb9b'}
 
+# number of concurrent requests to IMS, and the time to wait for each [sec]
+CONCURRENCY = 8
+TIMEOUT = 10
+
+# a keep alive connection pool, for the concurrent requests
 _session = requests.Session()
-_session.headers = _IMS_AUTH
+_session.headers.update(_IMS_AUTH)
+_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CONCURRENCY))
+
+# the forecasts are updated hourly
+PERIOD = 60*60
+# archived forecasts younger than this are used without asking IMS
+_ARCHIVE_MAX_AGE = PERIOD // 2
+
+_pool_lock = threading.Lock()
+_pool = None
 
 
 class NoForecastForDateException(Exception):
     pass
 
 
+def prefetch(stations):
+    # fetch the forecasts of all the stations concurrently. a failed forecast
+    # is logged here, and fails again when it is used.
+    _get_pool().map(_prefetch, set(station['temp_max_id'] for station in stations))
+
+
 def temp_max(station):
     return temp_forecast(station, datetime.now())
 
 
 def temp_forecast(station, date):
+    temp_max, _ = _day_forecast(station, date)
+    return temp_max
+
+
+def temp_hourly(station, date):
+    # the temperatures of the 24 hours of the date, as a float32 array
+    _, hourly = _day_forecast(station, date)
+    return hourly
+
+
+def modified(station):
+    # the time the forecast of the station was fetched, for the http
+    # validators
+    return _temp_forecast.stored(station['temp_max_id'])
+
+
+def _day_forecast(station, date):
     station_id = station['temp_max_id']
     forecast = _temp_forecast(station_id)
     date_text = datetime.strftime(date, '%Y-%m-%d')
@@ -30,18 +70,99 @@ def temp_forecast(station, date):
     return forecast[date_text]
 
 
-@CACHE.cache('temp_forecast', expire=60*60)
+def refresh(since, station_ids=()):
+    # fetches again the forecasts that were used lately, and the forecasts
+    # of station_ids
+    station_ids = set(args[0] for args in _temp_forecast.recent()) | set(station_ids)
+    _get_pool().map(lambda station_id: _refresh(since, station_id), station_ids)
+
+
+# the forecasts are refreshed every period, they expire only if the refresh
+# fails
+@caching.cache('ims-forecast', expire=2*PERIOD)
 def _temp_forecast(station_id):
-    logging.info('Collecting temperature forecast from IMS for %d', station_id)
-    resp = requests.get('https://ims.gov.il/he/full_forecast_data/{}'.format(station_id))
-    resp.raise_for_status()
-    data = resp.json()
+    forecast = archive.load_forecast(station_id, max_age=_ARCHIVE_MAX_AGE)
+    if forecast is not None:
+        return forecast
+
+    logging.info('Collecting temperature forecast from IMS for %s', station_id)
+    try:
+        resp = _session.get('https://ims.gov.il/he/full_forecast_data/{}'.format(station_id), timeout=TIMEOUT)
+        resp.raise_for_status()
+    except requests.RequestException:
+        # serve the last known forecast when IMS is down
+        forecast = archive.load_forecast(station_id)
+        if forecast is None:
+            raise
+        logging.exception('Failed getting forecast from IMS for %s, using archived forecast', station_id)
+        return forecast
+    forecast = _parse(resp.json())
+    archive.save_forecast(station_id, forecast)
+    return forecast
 
+
+def _parse(data):
+    # the forecast of every date: the max temperature, and the temperature of
+    # every hour
     forecast = {}
 
-    for date_text, date_forecast in data.iteritems():
+    for date_text, date_forecast in data.items():
         # forecast_data contains [min_temperature_of_day, max_temperature_of_day] as strings
         temp_max = int(date_forecast['daily']['maximum_temperature'])
-        forecast[date_text] = temp_max
+        hourly = _hourly(date_forecast.get('hourly'))
+        if date_forecast.get('hourly') and np.isnan(hourly).all():
+            logging.warning('No hours could be parsed of the IMS hourly forecast of %s', date_text)
+        forecast[date_text] = temp_max, hourly
+
+    # only the far dates have no hours, if none of the dates has them the
+    # layout of the response is not the one that is parsed, and the timelines
+    # would be all nan
+    if forecast and all(np.isnan(hourly).all() for _, hourly in forecast.values()):
+        logging.warning('The IMS forecast has no hourly temperatures of any date')
+
+    return forecast
+
+
+def _hourly(hourly_forecast):
+    # IMS gives the temperature of some of the hours of the day, as strings
+    # keyed by 'HH:MM'. the other hours are interpolated. far dates have no
+    # hours, they get nan.
+    hours = []
+    temps = []
+    if not isinstance(hourly_forecast, dict):
+        hourly_forecast = {}
+    for hour_text, hour_forecast in hourly_forecast.items():
+        try:
+            temp = float(hour_forecast['temperature'])
+            hour = int(hour_text.split(':')[0])
+        except (KeyError, TypeError, ValueError):
+            continue
+        hours.append(hour)
+        temps.append(temp)
+
+    if not hours:
+        return np.full(24, np.nan, dtype=np.float32)
+    order = np.argsort(hours)
+    return np.interp(np.arange(24), np.array(hours)[order], np.array(temps)[order]).astype(np.float32)
+
+
+def _prefetch(station_id):
+    try:
+        _temp_forecast(station_id)
+    except Exception:
+        logging.exception('Failed prefetching forecast from IMS for %s', station_id)
+
+
+def _refresh(since, station_id):
+    try:
+        _temp_forecast.refresh(since, station_id)
+    except Exception:
+        logging.exception('Failed refreshing forecast from IMS for %s', station_id)
+
 
-    return forecast
\ No newline at end of file
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(CONCURRENCY)
+        return _pool
@@ -5,13 +5,20 @@ from datetime import timedelta
 
 import flask
 from werkzeug import exceptions
-from beaker import cache
+import numpy as np
 
 import ims
 import uwyo
 import noaa
+import caching
 import calc
-import plot
+import render
+import prerender
+import refresh
+import history
+import httpcache
+import dashboard
+import encode
 import stations
 import timeformat
 
@@ -23,57 +30,78 @@ logging.basicConfig()
 
 DEFAULT_LOCATION = 'Megido'
 FORCAST_DAYS = 4
+HISTORY_DAYS = 30
+SENSITIVITY_DELTAS = np.arange(-6, 6.25, 0.25)
 
-CACHE = cache.CacheManager()
+# the refresh periods of the inputs of the observed and of the forecast
+# responses, they may be cached until the next refresh
+_OBSERVED_PERIODS = (uwyo.POLL, ims.PERIOD)
+_FORECAST_PERIODS = (noaa.GFS_CYCLE, ims.PERIOD)
 
 
 @app.route('/', methods=['GET'])
 def index():
     try:
-        uwyo_table, data_time = uwyo.data()
+        snapshot = dashboard.current(_render_dashboard)
     except uwyo.NoSoundingDataException:
         return flask.redirect('/no-data')
 
-    locations = []
-    max_tol = 0
+    # ?lat=&lon=&radius= shows only the stations in radius km of the
+    # coordinate, the region the user is looking at
+    if 'lat' in flask.request.args:
+        lat, lon = _coord_args()
+        radius, = _float_args('radius')
+        if radius < 0:
+            raise exceptions.BadRequest('Invalid radius')
+        region = set(name for name, _ in stations.within(lat, lon, radius))
+        names = [loc['name'] for loc in snapshot.locations if loc['name'] in region]
+        resp = flask.make_response(_render_dashboard(snapshot.data_time, dashboard.locations_of(snapshot.rows, names)))
+        etag = '{}-{}-{}-{}'.format(snapshot.etag, lat, lon, radius)
+        return httpcache.updated(resp, etag, _OBSERVED_PERIODS, [snapshot.modified, stations.modified()])
 
-    for loc in stations.all():
-        station = stations.get(loc)
-        loc = {
-            'name': loc,
-            'selected': False,
-            'data': calc.calculate(uwyo_table, ims.temp_max(station), station['elevation']),
-            'elevation': station['elevation'],
-        }
+    return httpcache.updated(flask.make_response(snapshot.html), snapshot.etag, _OBSERVED_PERIODS, [snapshot.modified])
 
-        locations.append(loc)
 
-        max_tol = max(max_tol, float(loc['data']['tol']))
+@app.route('/api/dashboard.json', methods=['GET'])
+def dashboard_json():
+    try:
+        snapshot = dashboard.current(_render_dashboard)
+    except uwyo.NoSoundingDataException:
+        raise exceptions.NotFound('No sounding data')
+    resp = flask.make_response(snapshot.json)
+    resp.mimetype = 'application/json'
+    return httpcache.updated(resp, snapshot.etag + '-json', _OBSERVED_PERIODS, [snapshot.modified])
 
-    for loc in locations:
-        loc['tol_percent'] = loc['data']['tol'] / max_tol * 100
 
-    return flask.render_template(
-        'index.html',
-        location=None,
-        hour=datetime.now().hour,
-        locations=locations,
-        data_time=timeformat.format(data_time),
-    )
+def _render_dashboard(data_time, locations):
+    # the dashboard is also built by the refresh thread, out of a request
+    with app.app_context():
+        return flask.render_template(
+            'index.html',
+            location=None,
+            locations=locations,
+            data_time=timeformat.format(data_time),
+        )
 
 
 @app.route('/locations/<location_name>', methods=['GET'])
 def site(location_name):
-    _, data_time = uwyo.data()
+    uwyo_table, data_time = uwyo.data()
+    station = stations.get(location_name)
+    version = render.key(uwyo_table, location_name, ims.temp_max(station))
+    dates = forecast_dates()
 
-    return flask.render_template(
+    resp = flask.make_response(flask.render_template(
         'location.html',
         location=location_name,
-        hour=datetime.now().hour,
+        version=version,
         locations=locations(location_name),
         data_time=timeformat.format(data_time),
-        forecast_dates=forecast_dates(),
-    )
+        forecast_dates=dates,
+    ))
+    etag = httpcache.key('location', version, data_time, dates, stations.all())
+    periods, modified = _observed_inputs(station, uwyo_table)
+    return httpcache.updated(resp, etag, periods, modified + [forecast_dates.stored()])
 
 
 @app.route('/locations/<location_name>/<date>', methods=['GET'])
@@ -84,24 +112,33 @@ def forecast(location_name, date):
         return flask.redirect('/?error=invalid-date-format')
 
     data_time = noaa.data_time(date)
+    station = stations.get(location_name)
+
+    try:
+        version = render.key(noaa.data(date, station['coord'])[0], location_name, ims.temp_forecast(station, date))
+    except (noaa.NoSoundingDataException, ims.NoForecastForDateException):
+        version = None
 
-    return flask.render_template(
+    dates = forecast_dates()
+
+    resp = flask.make_response(flask.render_template(
         'forecast.html',
         location=location_name,
+        version=version,
         locations=locations(location_name),
         data_time=timeformat.format(data_time),
-        forecast_dates=forecast_dates(),
-    )
+        forecast_dates=dates,
+    ))
+    etag = httpcache.key('forecast', location_name, version, data_time, dates, stations.all())
+    periods, modified = _forecast_inputs(station, date)
+    return httpcache.updated(resp, etag, periods, modified + [forecast_dates.stored()])
 
 
 @app.route('/sounding/<location_name>.png', methods=['GET'])
 def sounding(location_name):
     location_name = location_name.split('-')[0]
-    station = stations.get(location_name)
-    uwyo_table, time = uwyo.data()
-    temp = ims.temp_max(station)
-    data = calc.calculate(uwyo_table, temp, station['elevation'])
-    return flask.send_file(plot.plot(data), mimetype='image/png')
+    uwyo_table, temp = _observed(location_name)
+    return _send_sounding(uwyo_table, location_name, temp, _observed_inputs(stations.get(location_name), uwyo_table))
 
 
 @app.route('/sounding/<location_name>/<date>.png', methods=['GET'])
@@ -112,24 +149,214 @@ def sounding_forecast(location_name, date):
         return exceptions.BadRequest('Invalid date format')
 
     location_name = location_name.split('-')[0]
-    station = stations.get(location_name)
-    uwyo_table, time = noaa.data(date)
 
     try:
-        temp = ims.temp_forecast(station, date)
+        uwyo_table, temp = _forecast(location_name, date)
     except ims.NoForecastForDateException:
         return flask.redirect('/static/confused.png')
 
-    data = calc.calculate(uwyo_table, temp, station['elevation'])
-    return flask.send_file(plot.plot(data), mimetype='image/png')
+    return _send_sounding(uwyo_table, location_name, temp, _forecast_inputs(stations.get(location_name), date))
+
+
+@app.route('/api/sounding/<location_name>.json', methods=['GET'])
+def sounding_json(location_name):
+    uwyo_table, temp = _observed(location_name)
+    return _send_json(uwyo_table, location_name, temp, _observed_inputs(stations.get(location_name), uwyo_table))
+
+
+@app.route('/api/sounding/<location_name>/<date>.json', methods=['GET'])
+def sounding_forecast_json(location_name, date):
+    try:
+        date = timeformat.parse_month(date)
+    except timeformat.InvalidDateFormatException:
+        raise exceptions.BadRequest('Invalid date format')
+
+    try:
+        uwyo_table, temp = _forecast(location_name, date)
+    except ims.NoForecastForDateException:
+        raise exceptions.NotFound('No temperature forecast for date')
+
+    return _send_json(uwyo_table, location_name, temp, _forecast_inputs(stations.get(location_name), date))
+
+
+@app.route('/api/sounding/<location_name>/<date>/<int:hour>.json', methods=['GET'])
+def sounding_hourly_json(location_name, date, hour):
+    try:
+        date = timeformat.parse_month(date)
+    except timeformat.InvalidDateFormatException:
+        raise exceptions.BadRequest('Invalid date format')
+    if hour > 23:
+        raise exceptions.BadRequest('Invalid hour')
+
+    station = stations.get(location_name)
+    try:
+        profile, _ = noaa.hourly(date.replace(hour=hour), station['coord'])
+        temp = ims.temp_forecast(station, date)
+    except ims.NoForecastForDateException:
+        raise exceptions.NotFound('No temperature forecast for date')
+    except (noaa.NoSoundingDataException, noaa.InvalidTimeRangeException):
+        raise exceptions.NotFound('No forecast for hour')
+
+    return _send_json(profile, location_name, temp, _forecast_inputs(station, date.replace(hour=hour)))
+
+
+@app.route('/api/sensitivity/<location_name>', methods=['GET'])
+def sensitivity(location_name):
+    station = stations.get(location_name)
+    uwyo_table, _ = uwyo.data()
+    temp = ims.temp_max(station)
+    resp = flask.jsonify(_sensitivity(uwyo_table, location_name, temp, station['elevation']))
+    etag = httpcache.key('sensitivity', uwyo_table.key, location_name, temp, station['elevation'])
+    return httpcache.updated(resp, etag, *_observed_inputs(station, uwyo_table))
+
+
+@caching.cache('sensitivity', expire=60*60)
+def _sensitivity(profile, location_name, temp, elevation):
+    # the elevation is an argument so an edit of the station is not served
+    # from the cache
+    sweep = calc.sensitivity(profile, temp, elevation, SENSITIVITY_DELTAS)
+    return {
+        'location': location_name,
+        'data_time': timeformat.format(profile.time),
+        't0': temp,
+        'h0': elevation,
+        'trig_0': round(float(sweep['trig_0']), 1),
+        't0s': np.round(sweep['t0'], 2).tolist(),
+        'tol': np.round(sweep['tol']).tolist(),
+        'tol_minus_3': np.round(sweep['tol_minus_3']).tolist(),
+        'cloud_base': np.round(sweep['cloud_base']).tolist(),
+    }
+
+
+@app.route('/api/timeline/<location_name>', methods=['GET'])
+def timeline(location_name):
+    station = stations.get(location_name)
+    profile, _ = uwyo.data()
+    try:
+        hourly = ims.temp_hourly(station, datetime.now())
+    except ims.NoForecastForDateException:
+        raise exceptions.NotFound('No temperature forecast for date')
+    return _send_timeline(profile, location_name, hourly, _observed_inputs(station, profile))
+
+
+@app.route('/api/timeline/<location_name>/<date>', methods=['GET'])
+def timeline_forecast(location_name, date):
+    try:
+        date = timeformat.parse_month(date)
+    except timeformat.InvalidDateFormatException:
+        raise exceptions.BadRequest('Invalid date format')
+
+    station = stations.get(location_name)
+    try:
+        profile, _ = noaa.data(date, station['coord'])
+        hourly = ims.temp_hourly(station, date)
+    except ims.NoForecastForDateException:
+        raise exceptions.NotFound('No temperature forecast for date')
+    except (noaa.NoSoundingDataException, noaa.InvalidTimeRangeException):
+        raise exceptions.NotFound('No forecast for date')
+
+    return _send_timeline(profile, location_name, hourly, _forecast_inputs(station, date))
+
+
+@app.route('/api/nearest', methods=['GET'])
+def nearest_json():
+    lat, lon = _coord_args()
+    try:
+        k = int(flask.request.args.get('k', 1))
+    except ValueError:
+        raise exceptions.BadRequest('Invalid k')
+    if k < 1:
+        raise exceptions.BadRequest('Invalid k')
+    return httpcache.conditional(flask.jsonify([
+        {
+            'name': name,
+            'distance': round(distance, 1),
+            'coord': stations.get(name)['coord'],
+            'elevation': stations.get(name)['elevation'],
+        }
+        for name, distance in stations.nearest(lat, lon, k)
+    ]))
+
+
+def _coord_args():
+    lat, lon = _float_args('lat', 'lon')
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise exceptions.BadRequest('Invalid coordinate')
+    return lat, lon
+
+
+def _float_args(*names):
+    try:
+        values = [float(flask.request.args[name]) for name in names]
+    except KeyError as e:
+        raise exceptions.BadRequest('Missing argument: {}'.format(e.args[0]))
+    except ValueError:
+        raise exceptions.BadRequest('Invalid arguments: {}'.format(', '.join(names)))
+    # float accepts nan and inf, that are not a position or a distance
+    if not np.isfinite(values).all():
+        raise exceptions.BadRequest('Invalid arguments: {}'.format(', '.join(names)))
+    return values
+
+
+@app.route('/api/history', methods=['GET'])
+def history_json():
+    # ?stations=A,B selects the stations, all by default. ?from= and ?to= are
+    # dates, the last HISTORY_DAYS by default. ?aggregate=1 returns the
+    # count, mean, min and max of every value instead of the rows.
+    args = flask.request.args
+    names = args['stations'].split(',') if args.get('stations') else stations.all()
+    for name in names:
+        stations.get(name)
+    try:
+        end = timeformat.parse_month(args['to']) if 'to' in args else datetime.now()
+        start = timeformat.parse_month(args['from']) if 'from' in args else end - timedelta(days=HISTORY_DAYS)
+    except timeformat.InvalidDateFormatException:
+        raise exceptions.BadRequest('Invalid date format')
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = end.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    if args.get('aggregate'):
+        result = {name: history.aggregate(name, start, end) for name in names}
+    else:
+        result = {name: _history_rows(history.query(name, start, end)) for name in names}
+
+    # a new sounding is recorded on the uwyo refresh
+    resp = flask.jsonify({
+        'from': timeformat.format_month(start),
+        'to': timeformat.format_month(end - timedelta(days=1)),
+        'stations': result,
+    })
+    return httpcache.updated(resp, None, (uwyo.POLL,))
+
+
+def _history_rows(rows):
+    result = {
+        'time': [timeformat.format(time) for time in rows['time'].astype(datetime)],
+        'estimated': rows['estimated'].astype(bool).tolist(),
+    }
+    for column in history.VALUES:
+        result[column] = _rounded(rows[column], 1 if column in ('t0', 'trig_0') else 0)
+    return result
+
+
+@app.route('/api/prerender', methods=['GET'])
+def prerender_status():
+    return httpcache.uncached(flask.jsonify(prerender.status()))
 
 
 @app.route('/no-data', methods=['GET'])
 def no_data():
-    return flask.render_template(
+    return httpcache.uncached(flask.make_response(flask.render_template(
         'no_data.html',
         hour=datetime.now().hour,
-    )
+    )))
+
+
+@app.errorhandler(render.RenderQueueFullException)
+def render_queue_full(e):
+    resp = flask.make_response('Too many sounding images are being drawn, please retry', 503)
+    resp.headers['Retry-After'] = str(render.RETRY_AFTER)
+    return resp
 
 
 @app.context_processor
@@ -145,6 +372,83 @@ def level():
     return {'level': level}
 
 
+def _observed(location_name):
+    station = stations.get(location_name)
+    uwyo_table, _ = uwyo.data()
+    return uwyo_table, ims.temp_max(station)
+
+
+def _forecast(location_name, date):
+    station = stations.get(location_name)
+    uwyo_table, _ = noaa.data(date, station['coord'])
+    return uwyo_table, ims.temp_forecast(station, date)
+
+
+def _observed_inputs(station, profile):
+    # the refresh periods of the inputs of an observed response, and the
+    # times they were stored
+    return _OBSERVED_PERIODS, [uwyo.modified(profile.time), ims.modified(station), stations.modified()]
+
+
+def _forecast_inputs(station, date):
+    return _FORECAST_PERIODS, [noaa.modified(date, station['coord']), ims.modified(station), stations.modified()]
+
+
+def _send_json(profile, location_name, temp, inputs):
+    station = stations.get(location_name)
+    data = calc.calculate(profile, temp, station['elevation'])
+    key = render.key(profile, location_name, temp)
+
+    # ?format=f32 sends the values packed as float32, see encode.to_f32
+    if flask.request.args.get('format') == 'f32':
+        resp = flask.make_response(encode.to_f32(data))
+        resp.mimetype = 'application/octet-stream'
+        resp.headers['X-Sounding-Layout'] = encode.LAYOUT
+        key += '-f32'
+    else:
+        resp = flask.jsonify(encode.to_json(data))
+
+    return httpcache.updated(resp, key, *inputs)
+
+
+def _send_timeline(profile, location_name, hourly, inputs):
+    # the TOL of every hour of the day, in one pass over the sounding
+    station = stations.get(location_name)
+    timeline = calc.timeline(profile, hourly, station['elevation'])
+    resp = flask.jsonify({
+        'location': location_name,
+        'data_time': timeformat.format(profile.time),
+        'h0': station['elevation'],
+        'trig_0': round(float(timeline['trig_0']), 1),
+        'hours': list(range(len(hourly))),
+        't0s': _rounded(timeline['t0'], 1),
+        'tol': _rounded(timeline['tol'], 0),
+        'tol_minus_3': _rounded(timeline['tol_minus_3'], 0),
+        'cloud_base': _rounded(timeline['cloud_base'], 0),
+        'trigger': timeline['trigger'].tolist(),
+    })
+    etag = httpcache.key('timeline', profile.key, location_name, station['elevation'], np.asarray(hourly).tolist())
+    return httpcache.updated(resp, etag, *inputs)
+
+
+def _rounded(values, decimals):
+    # nan values are sent as null. float32 values are rounded as float64, so
+    # they are sent with no float32 digits.
+    values = np.round(np.asarray(values, dtype=np.float64), decimals)
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def _send_sounding(profile, location_name, temp, inputs):
+    key, path = render.image(profile, location_name, temp)
+    resp = flask.send_file(path, mimetype='image/png', conditional=False)
+
+    # pages link to the image with its key, such a URL always has the same
+    # content
+    if flask.request.args.get('v') == key:
+        return httpcache.conditional(resp, key, max_age=httpcache.LONG_MAX_AGE)
+    return httpcache.updated(resp, key, *inputs)
+
+
 def locations(location_name):
     return [
         {'name': loc, 'selected': loc == location_name}
@@ -152,7 +456,7 @@ def locations(location_name):
     ]
 
 
-@CACHE.cache('forecast-dates', expire=3*60*60)
+@caching.cache('forecast-dates', expire=3*60*60)
 def forecast_dates():
     now = datetime.now()
     now = now.replace(hour=12, minute=0, second=0, microsecond=0)
@@ -160,3 +464,79 @@ def forecast_dates():
         timeformat.format_month(now + timedelta(days=i))
         for i in range(FORCAST_DAYS)
     ]
+
+
+def _prerender_observed(profile):
+    prerender.start(profile, ims.temp_max)
+    prerender.background(_fetch_forecasts)
+
+
+def _prerender_forecast(profile, cell):
+    # a bulk NOAA fetch brings the forecasts of every 3 hours, only the
+    # forecasts of the site dates are rendered ahead
+    if profile.time not in [timeformat.parse_month(date) for date in forecast_dates()]:
+        return
+    names = [name for name in stations.all() if noaa.grid_cell(stations.get(name)['coord']) == cell]
+    # a recently used cell may have no stations after a station moved
+    if not names:
+        return
+    prerender.start(profile, lambda station: ims.temp_forecast(station, profile.time), names)
+
+
+def _fetch_forecasts():
+    coords = [stations.get(name)['coord'] for name in stations.all()]
+    for date in forecast_dates():
+        noaa.prefetch(coords, timeformat.parse_month(date))
+
+
+def _refresh_forecasts(since):
+    noaa.refresh(
+        since,
+        [timeformat.parse_month(date) for date in forecast_dates()],
+        [stations.get(name)['coord'] for name in stations.all()],
+    )
+
+
+def _refresh_temp_forecasts(since):
+    ims.refresh(since, [stations.get(name)['temp_max_id'] for name in stations.all()])
+
+
+def _refresh_dashboard(since):
+    # scheduled after the jobs that refresh its inputs, so the index is
+    # built here and never on a request
+    try:
+        dashboard.current(_render_dashboard, force=True)
+    except uwyo.NoSoundingDataException:
+        pass
+
+
+def _record_history(profile):
+    prerender.background(history.record, profile, stations.all())
+
+
+_started = []
+
+
+def start():
+    # starts the background work of a serving process: the prerender and
+    # history subscribers, and the refresh jobs. it is called by the gunicorn
+    # post_worker_init hook in gunicorn.conf.py, so importing main has no
+    # side effects.
+    if _started:
+        return
+    _started.append(True)
+
+    uwyo.subscribe(_prerender_observed)
+    uwyo.subscribe(_record_history)
+    noaa.subscribe(_prerender_forecast)
+
+    refresh.schedule(uwyo.refresh, uwyo.POLL)
+    refresh.schedule(_refresh_forecasts, noaa.GFS_CYCLE)
+    refresh.schedule(_refresh_temp_forecasts, ims.PERIOD)
+    refresh.schedule(_refresh_dashboard, uwyo.POLL)
+    refresh.start()
+
+
+if __name__ == '__main__':
+    start()
+    app.run()
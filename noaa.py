@@ -1,18 +1,16 @@
 import time
-import matplotlib
-matplotlib.use("Agg")
-
-from beaker import cache
 import logging
+import threading
 from datetime import datetime
 from datetime import timedelta
+from multiprocessing.pool import ThreadPool
 import requests
 from werkzeug import exceptions
-from io import StringIO
-import pandas as pd
-from metpy.units import units
-import metpy.calc as mpcalc
 
+import archive
+import caching
+import parse
+import sounding
 import timeformat
 
 
@@ -24,22 +22,40 @@ class InvalidTimeRangeException(Exception):
     pass
 
 
-CACHE = cache.CacheManager()
-_URL = 'https://rucsoundings.noaa.gov/get_soundings.cgi?data_source=GFS&start_year={date.year}&start_month_name={month}&start_mday={date.day}&start_hour={date.hour}&start_min=0&n_hrs=1.0&fcst_len=shortest&airport=32.6%2C35.23&text=Ascii%20text%20%28GSD%20format%29&hydrometeors=false&startSecs={start_sec}&endSecs={end_sec}'
-_COL_NAMES = ['cape', 'pressure', 'height', 'temperature', 'dewpoint', 'direction', 'speed']
+_URL = 'https://rucsoundings.noaa.gov/get_soundings.cgi?data_source=GFS&start_year={date.year}&start_month_name={month}&start_mday={date.day}&start_hour={date.hour}&start_min=0&n_hrs={hours}&fcst_len=shortest&airport={airport}&text=Ascii%20text%20%28GSD%20format%29&hydrometeors=false&startSecs={start_sec}&endSecs={end_sec}'
+# forecasts are fetched at the GFS grid point of each station. stations in
+# the same grid cell [deg] share one fetch and one cache entry.
+GRID = 0.5
+# number of grid cells that are fetched concurrently, and the time to wait
+# for each [sec]. the bulk response is large, and the refresh jobs run one
+# after the other, so a hung request must not hold the others.
+CONCURRENCY = 4
+TIMEOUT = 60
+# a new GFS forecast is released every 3 hours
+GFS_CYCLE = 3*60*60
+# all the forecasts from a requested time to this many hours after it are
+# fetched in one request, which covers the whole forecast window
+BULK_HOURS = 5*24
 _MIN_SOUNDING_LEN = 5
+# archived forecasts younger than this are used without asking NOAA
+_ARCHIVE_MAX_AGE = 60*60
 
+# functions that are called with every new sounding that is fetched, and the
+# grid cell it was fetched for
+_subscribers = []
 
-def data(date):
-    date = data_time(date)
+_pool_lock = threading.Lock()
+_pool = None
 
-    start_sec = int(time.mktime(date.timetuple()))
-    end_sec = start_sec + 3600
-    month = date.strftime("%b")
 
-    # first try noon measurements
-    url = _URL.format(date=date, month=month, start_sec=start_sec, end_sec=end_sec)
-    data = _uwyo_data_get(url)
+def subscribe(fn):
+    _subscribers.append(fn)
+
+
+def data(date, coord):
+    date = data_time(date)
+
+    data = _sounding(grid_cell(coord), date)
     if data is not None:
         return data, date
 
@@ -47,63 +63,161 @@ def data(date):
     raise NoSoundingDataException()
 
 
+def hourly(date, coord):
+    # the sounding of any hour, blended from the forecasts of the GFS cycles
+    # around it. they are fetched together by the bulk request.
+    date = date.replace(minute=0, second=0, microsecond=0)
+    before, before_time = data(date, coord)
+    if before_time == date:
+        return before, date
+    after, _ = data(before_time + timedelta(seconds=GFS_CYCLE), coord)
+    return _interpolated(before, after, date), date
+
+
+def modified(date, coord):
+    # the time the forecasts that the sounding of date at coord is made of
+    # were fetched, for the http validators. an hour between cycles is
+    # blended with the cycle after it.
+    time = data_time(date)
+    cell = grid_cell(coord)
+    stored = [_sounding.stored(cell, time), _sounding.stored(cell, time + timedelta(seconds=GFS_CYCLE))]
+    return max([t for t in stored if t is not None] or [None])
+
+
+def grid_cell(coord):
+    return round(coord['lat'] / GRID) * GRID, round(coord['long'] / GRID) * GRID
+
+
+def prefetch(coords, date):
+    # fetch the forecasts of all the grid cells of coords concurrently
+    date = data_time(date)
+    _get_pool().map(lambda cell: _prefetch(cell, date), set(map(grid_cell, coords)))
+
+
+def refresh(since, dates=(), coords=()):
+    # fetches again the forecasts that were used lately, and the forecasts
+    # of dates at coords, after a new GFS cycle
+    times = {}
+    for cell, time in _sounding.recent():
+        times.setdefault(cell, set()).add(time)
+    for cell in map(grid_cell, coords):
+        times.setdefault(cell, set()).update(map(data_time, dates))
+    _get_pool().map(lambda item: _refresh(since, *item), times.items())
+
+
 def data_time(date):
     if date > datetime.now() + timedelta(days=5):
         raise InvalidTimeRangeException()
 
-    # round hours to a multiple of 3
-    date -= timedelta(hours=date.hour % 3, minutes=date.minute, seconds=date.second)
+    # round hours to a GFS cycle
+    date -= timedelta(hours=date.hour % (GFS_CYCLE // 3600), minutes=date.minute, seconds=date.second, microseconds=date.microsecond)
 
     return date
 
 
-@CACHE.cache('noaa-data', expire=60*60)
-def _uwyo_data_get(url):
-    logging.info('Collecting data from NOAA')
-    # get HTML sounding content
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        logging.error('Got unexpected status from "noaa: %d: %s', resp.status_code, resp.content)
-        raise exceptions.InternalServerError('Failed to get sounding data from "http://weather.uwyo.edu"')
+def _url(cell, date, hours):
+    start_sec = int(time.mktime(date.timetuple()))
+    end_sec = start_sec + hours * 3600
+    month = date.strftime("%b")
+    return _URL.format(date=date, month=month, start_sec=start_sec, end_sec=end_sec, hours=hours, airport=requests.utils.quote(_airport(cell)))
+
+
+def _airport(cell):
+    return '{},{}'.format(*cell)
+
+
+# the forecasts are refreshed on every GFS cycle, they expire only if the
+# refresh fails
+@caching.cache('noaa-data', expire=2*GFS_CYCLE)
+def _sounding(cell, time):
+    profile = archive.load_sounding('noaa', _airport(cell), time, max_age=_ARCHIVE_MAX_AGE)
+    if profile is not None:
+        return profile
+
+    logging.info('Collecting data from NOAA for %s', _airport(cell))
+    try:
+        resp = requests.get(_url(cell, time, BULK_HOURS), timeout=TIMEOUT)
+        resp.raise_for_status()
+    except requests.RequestException:
+        logging.exception('Failed getting sounding data from NOAA')
+        # serve an older forecast for the same time when NOAA is down
+        profile = archive.load_sounding('noaa', _airport(cell), time)
+        if profile is not None:
+            return profile
+        raise exceptions.InternalServerError('Failed to get sounding data from "https://rucsoundings.noaa.gov"')
+
+    # the response has the forecasts of all the following times, they fill
+    # the cache of their own times
+    profile = None
+    for other in _parse_many(resp.text):
+        archive.save_sounding(other, _airport(cell))
+        if other.time == time:
+            profile = other
+        else:
+            _sounding.put(other, cell, other.time)
+        _publish(other, cell)
+    if profile is not None:
+        return profile
+
+    # a partial response. nothing is returned, so no value is cached for the
+    # time and the next request fetches it again.
+    logging.warning('No NOAA sounding for %s in the response for %s', time, _airport(cell))
+    profile = archive.load_sounding('noaa', _airport(cell), time)
+    if profile is not None:
+        return profile
+    raise NoSoundingDataException()
+
+
+@caching.cache('noaa-hourly', expire=2*GFS_CYCLE)
+def _interpolated(before, after, time):
+    return sounding.interpolate(before, after, time)
 
-    table = resp.text
 
-    df = pd.read_fwf(StringIO(table), skiprows=6, usecols=[1, 2, 3, 4, 5, 6], names=_COL_NAMES)
+def _publish(profile, cell):
+    for fn in _subscribers:
+        try:
+            fn(profile, cell)
+        except Exception:
+            logging.exception('Failed notifying about new NOAA sounding')
 
-    df = df.dropna(
-        subset=('temperature', 'dewpoint', 'direction', 'speed'),
-        how='all').reset_index(drop=True)
 
-    if any((
-        len(df['height']) < _MIN_SOUNDING_LEN,
-        len(df['temperature']) < _MIN_SOUNDING_LEN,
-        len(df['pressure']) < _MIN_SOUNDING_LEN,
-        len(df['dewpoint']) < _MIN_SOUNDING_LEN,
-    )):
-        return None
+def _prefetch(cell, time):
+    try:
+        _sounding(cell, time)
+    except Exception:
+        logging.exception('Failed prefetching NOAA sounding for %s', _airport(cell))
+
 
-    d = Data(
-        h=df['height'].values * units.meter,
-        p=df['pressure'].values / 10.0 * units.hPa,
-        T=df['temperature'].values / 10.0 * units.degC,
-        Td=df['dewpoint'].values / 10.0 * units.degC,
-    )
-    d.h = d.h.to('feet')
+def _refresh(since, cell, times):
+    # the earliest time is fetched first, so its bulk request fills all the
+    # others
+    for time in sorted(times):
+        try:
+            _sounding.refresh(since, cell, time)
+        except Exception:
+            logging.exception('Failed refreshing NOAA sounding for %s', _airport(cell))
 
-    d.wind_u, d.wind_v = mpcalc.get_wind_components(
-        df['speed'].values * units.knots,
-        df['direction'].values * units.degrees)
 
-    return d
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPool(CONCURRENCY)
+        return _pool
 
 
-class Data:
+def _parse(table, time):
+    columns = parse.noaa(table)
+
+    if len(columns['height']) < _MIN_SOUNDING_LEN:
+        return None
+
+    return sounding.from_columns('noaa', time, columns)
 
-    def __init__(self, h, p, T, Td):
-        self.h = h
-        self.p = p
-        self.T = T
-        self.Td = Td
-        self.wind_u = None
-        self.wind_v = None
 
+def _parse_many(text):
+    profiles = []
+    for time, columns in parse.noaa_soundings(text):
+        if len(columns['height']) >= _MIN_SOUNDING_LEN:
+            profiles.append(sounding.from_columns('noaa', time, columns))
+    return profiles
@@ -0,0 +1,113 @@
+import re
+from datetime import datetime
+
+import numpy as np
+
+
+# the columns that are decoded from the sounding texts
+COLUMNS = ('pressure', 'height', 'temperature', 'dewpoint', 'direction', 'speed')
+
+# UWYO TEXT:LIST table: fixed width columns of PRES, HGHT, TEMP, DWPT, RELH,
+# MIXR, DRCT, SKNT, THTA, THTE, THTV after 4 header lines
+_UWYO_PRE = re.compile(br'<pre>(.*?)</pre>', re.IGNORECASE | re.DOTALL)
+_UWYO_WIDTH = 7
+_UWYO_HEADER_LINES = 4
+_UWYO_COLUMNS = {
+    'pressure': 0,
+    'height': 1,
+    'temperature': 2,
+    'dewpoint': 3,
+    'direction': 6,
+    'speed': 7,
+}
+
+# NOAA GSD lines: LINTYP, PRESSURE [hPa*10], HEIGHT [m], TEMP [C*10],
+# DEWPT [C*10], WIND DIR [deg], WIND SPD [knot]. line types 4 to 9 are
+# sounding levels, and 99999 marks a missing value.
+_NOAA_LEVEL_TYPES = {b'4', b'5', b'6', b'7', b'8', b'9'}
+_NOAA_MISSING = 99999
+_NOAA_SCALE = (10.0, 1.0, 10.0, 10.0, 1.0, 1.0)
+# a GSD text of a few hours has a sounding for every valid time, each starts
+# with a line of model, hour, day, month and year
+_NOAA_TIME = re.compile(br'^\s*[A-Za-z][\w-]*\s+(\d+)\s+(\d+)\s+([A-Za-z]{3})\s+(\d{4})\s*$', re.MULTILINE)
+_MONTHS = (b'jan', b'feb', b'mar', b'apr', b'may', b'jun', b'jul', b'aug', b'sep', b'oct', b'nov', b'dec')
+
+
+def uwyo(content):
+    # returns the sounding columns of a UWYO page, or None if the page has no
+    # sounding table
+    match = _UWYO_PRE.search(_bytes(content))
+    if match is None:
+        return None
+
+    lines = [
+        line for line in match.group(1).splitlines()[_UWYO_HEADER_LINES + 1:]
+        if line.strip()
+    ]
+    if not lines:
+        return _filter(dict((name, np.empty(0)) for name in COLUMNS))
+
+    # cut all the lines to the same width, and view every cell as a string
+    n_cells = max(_UWYO_COLUMNS.values()) + 1
+    width = _UWYO_WIDTH * n_cells
+    table = np.array([line[:width].ljust(width) for line in lines], dtype='S{}'.format(width))
+    cells = table.view('S{}'.format(_UWYO_WIDTH)).reshape(len(lines), n_cells)
+
+    return _filter(dict(
+        (name, _floats(cells[:, i]))
+        for name, i in _UWYO_COLUMNS.items()
+    ))
+
+
+def noaa(text):
+    rows = []
+    for line in _bytes(text).splitlines():
+        fields = line.split()
+        if len(fields) == 7 and fields[0] in _NOAA_LEVEL_TYPES:
+            rows.append(fields[1:])
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS))
+    values[values == _NOAA_MISSING] = np.nan
+    values /= _NOAA_SCALE
+
+    return _filter(dict(
+        (name, values[:, i])
+        for i, name in enumerate(COLUMNS)
+    ))
+
+
+def noaa_soundings(text):
+    # returns the valid time and the sounding columns of every sounding in a
+    # GSD text
+    text = _bytes(text)
+    matches = list(_NOAA_TIME.finditer(text))
+    soundings = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        hour, day, month, year = match.groups()
+        time = datetime(int(year), _MONTHS.index(month.lower()) + 1, int(day), int(hour))
+        soundings.append((time, noaa(text[match.end():end])))
+    return soundings
+
+
+def _floats(cells):
+    # blank cells are missing values
+    blank = np.char.strip(cells) == b''
+    return np.where(blank, b'nan', cells).astype(np.float64)
+
+
+def _filter(columns):
+    # drop the levels that have no measurement at all
+    measured = ~(
+        np.isnan(columns['temperature']) &
+        np.isnan(columns['dewpoint']) &
+        np.isnan(columns['direction']) &
+        np.isnan(columns['speed'])
+    )
+    return dict((name, values[measured]) for name, values in columns.items())
+
+
+def _bytes(content):
+    if isinstance(content, bytes):
+        return content
+    return content.encode('latin-1')
@@ -1,93 +1,188 @@
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib import ticker
 from matplotlib import transforms
 import io
+import struct
+import threading
+import zlib
 import numpy as np
 
-from beaker import cache
-import logging
+import calc
+import sounding
 
 
-CACHE = cache.CacheManager()
 FILE_NAME = '/tmp/sounding-{date.year}-{date.month}-{date.day}-{hour}.png'
+# the sounding levels are on a fine fixed grid, draw a wind barb only every
+# few of them
+BARB_EVERY = 10
+# the rendered images are mostly flat colors, a low zlib level compresses
+# them almost as well as the default in a fraction of the time
+PNG_COMPRESSION = 3
 
 
 matplotlib.rc('font', size=16)
 
-
-def plot(data):
-    buf = _cached(data)
-    copy = io.BytesIO()
-    copy.write(buf)
-    copy.seek(0)
-    return copy
-
-
-@CACHE.cache('plot', expire=60)
-def _cached(data):
-    logging.info('Drawing plot')
-    plt = _plot(**data)
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    return buf.read()
-
-
-def _plot(height, temp, dew, temp_max, trig, h0, t0, trig_0, tol, tol_minus_3, cloud_base, lim_h, lim_t, wind_u, wind_v):
-    fig = plt.figure(figsize=(6, 10))
-    ax = fig.add_subplot(111)
-    ax.grid(True)
-    ax.set_ylim(*lim_h)
-    ax.set_xlim(*lim_t)
-    ax.set_xlabel('Temp [C]')
-    ax.set_ylabel('Elevation [1000f]')
-
-    ax.yaxis.set_major_formatter(ticker.FuncFormatter(
-        lambda y, pos: '%.0f' % (y * 1e-3)))
-
-    # Plot the data using normal plotting functions, in this case using
-    # log scaling in Y, as dictated by the typical meteorological plot
-    ax.plot(temp, height, 'r', label='Temp [C]')
-    ax.plot(dew, height, 'b', label='Dew Point [C]')
-
-    # plot temp max
-    ax.plot(temp_max, height, 'g', label='Tmax DALR {:.1f} C'.format(t0))
-
-    # plot ground
-    ax.plot(lim_t, [h0, h0], 'brown', label='Ground {:.0f}'.format(h0))
-
-    # calculate trigger temperature
-    ax.plot(trig, height, 'g--', label='Trigger {:.1f} C'.format(trig_0))
-
-    # plot TOL and T-3 and cloud base
-    ax.plot([lim_t[-1] - 3], [tol], "ro", label='TOL {:.0f} ft'.format(tol), marker=r'^', markersize=16)
-    ax.plot([lim_t[-1] - 3], [tol_minus_3], 'yo', label='T-3 {:.0f} ft'.format(tol_minus_3), marker=r'^', markersize=16)
-    ax.plot([lim_t[-1] - 3], [cloud_base], 'bo', label='Cloud Base {:.0f} ft'.format(cloud_base), marker=r'^', markersize=16)
-
-    xloc = 0.1
-    x_clip_radius = 0.08
-    y_clip_radius = 0.08
-
-    x = np.empty_like(height)
-    x.fill(xloc)
-
-    # Do barbs plot at this location
-    b = ax.barbs(x, height, wind_u, wind_v,
-                      transform=ax.get_yaxis_transform(which='tick2'),
-                      clip_on=True)
-
-    # Override the default clip box, which is the axes rectangle, so we can have
-    # barbs that extend outside.
-    ax_bbox = transforms.Bbox([[xloc - x_clip_radius, -y_clip_radius],
-                               [xloc + x_clip_radius, 1.0 + y_clip_radius]])
-    b.set_clip_box(transforms.TransformedBbox(ax_bbox, ax.transAxes))
-
-    fig.tight_layout()
-    fig.legend()
-    return fig
-
-
-
-
+# matplotlib is not thread safe, and the template is shared by all the
+# threads of the process
+_lock = threading.Lock()
+_template = None
+
+
+def render(data):
+    with _lock:
+        return _get_template().render(**data)
+
+
+def warm():
+    with _lock:
+        _get_template()
+
+
+def _get_template():
+    global _template
+    if _template is None:
+        _template = _Template()
+    return _template
+
+
+def close():
+    global _template
+    with _lock:
+        if _template is not None:
+            _template.close()
+            _template = None
+
+
+class _Template(object):
+    # the figure scaffolding is built and drawn once. every render restores
+    # the drawn scaffolding, and draws only the artists that depend on the
+    # data on top of it.
+
+    def __init__(self):
+        lim_h, lim_t = calc._LIM_H, calc._LIM_T
+
+        self.fig = Figure(figsize=(6, 10))
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.buf = io.BytesIO()
+
+        ax = self.fig.add_subplot(111)
+        ax.grid(True)
+        ax.set_ylim(*lim_h)
+        ax.set_xlim(*lim_t)
+        ax.set_xlabel('Temp [C]')
+        ax.set_ylabel('Elevation [1000f]')
+
+        ax.yaxis.set_major_formatter(ticker.FuncFormatter(
+            lambda y, pos: '%.0f' % (y * 1e-3)))
+
+        # the lines are created empty, in the order of the legend entries
+        self.temp, = ax.plot([], [], 'r', label='Temp [C]')
+        self.dew, = ax.plot([], [], 'b', label='Dew Point [C]')
+        self.temp_max, = ax.plot([], [], 'g', label='Tmax DALR')
+        self.ground, = ax.plot(lim_t, [0, 0], 'brown', label='Ground')
+        self.trig, = ax.plot([], [], 'g--', label='Trigger')
+
+        # TOL and T-3 and cloud base markers
+        marker_x = [lim_t[-1] - 3]
+        self.tol, = ax.plot(marker_x, [0], 'r^', label='TOL', markersize=16)
+        self.tol_minus_3, = ax.plot(marker_x, [0], 'y^', label='T-3', markersize=16)
+        self.cloud_base, = ax.plot(marker_x, [0], 'b^', label='Cloud Base', markersize=16)
+
+        xloc = 0.1
+        x_clip_radius = 0.08
+        y_clip_radius = 0.08
+
+        # the barbs are drawn on the fixed sounding grid, only their
+        # components change between renders
+        height = sounding.HEIGHT[::BARB_EVERY]
+        x = np.empty_like(height)
+        x.fill(xloc)
+        zeros = np.zeros_like(height)
+        self.barbs = ax.barbs(x, height, zeros, zeros,
+                              transform=ax.get_yaxis_transform(which='tick2'),
+                              clip_on=True)
+
+        # Override the default clip box, which is the axes rectangle, so we can have
+        # barbs that extend outside.
+        ax_bbox = transforms.Bbox([[xloc - x_clip_radius, -y_clip_radius],
+                                   [xloc + x_clip_radius, 1.0 + y_clip_radius]])
+        self.barbs.set_clip_box(transforms.TransformedBbox(ax_bbox, ax.transAxes))
+
+        self.fig.tight_layout()
+        self.legend = self.fig.legend()
+        self.labels = self.legend.get_texts()
+
+        self.dynamic = [
+            self.temp, self.dew, self.temp_max, self.ground, self.trig,
+            self.tol, self.tol_minus_3, self.cloud_base, self.barbs,
+            self.legend,
+        ]
+        for artist in self.dynamic:
+            artist.set_animated(True)
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        width, height = self.canvas.get_width_height()
+        self.shape = height, width, 4
+
+    def render(self, height, temp, dew, temp_max, trig, h0, t0, trig_0, tol, tol_minus_3, cloud_base, lim_h, lim_t, wind_u, wind_v):
+        self.temp.set_data(temp, height)
+        self.dew.set_data(dew, height)
+        self.temp_max.set_data(temp_max, height)
+        self.ground.set_ydata([h0, h0])
+        self.trig.set_data(trig, height)
+        self.tol.set_ydata([tol])
+        self.tol_minus_3.set_ydata([tol_minus_3])
+        self.cloud_base.set_ydata([cloud_base])
+        self.barbs.set_UVC(wind_u[::BARB_EVERY], wind_v[::BARB_EVERY])
+
+        for text, label in zip(self.labels, (
+            'Temp [C]',
+            'Dew Point [C]',
+            'Tmax DALR {:.1f} C'.format(t0),
+            'Ground {:.0f}'.format(h0),
+            'Trigger {:.1f} C'.format(trig_0),
+            'TOL {:.0f} ft'.format(tol),
+            'T-3 {:.0f} ft'.format(tol_minus_3),
+            'Cloud Base {:.0f} ft'.format(cloud_base),
+        )):
+            text.set_text(label)
+
+        self.canvas.restore_region(self.background)
+        for artist in self.dynamic:
+            self.fig.draw_artist(artist)
+
+        # encode the canvas as it is, printing it would draw the whole
+        # figure again
+        rgba = np.frombuffer(self.canvas.buffer_rgba(), dtype=np.uint8).reshape(self.shape)
+        self.buf.seek(0)
+        self.buf.truncate()
+        _write_png(self.buf, rgba)
+        return self.buf.getvalue()
+
+    def close(self):
+        self.fig.clear()
+        self.buf.close()
+
+
+def _write_png(f, rgba):
+    # the figure is opaque, so the image is written as RGB. every row is
+    # prefixed with a 0 byte, for no PNG filter.
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    raw[:, 1:] = rgba[:, :, :3].reshape(height, 3 * width)
+
+    f.write(b'\x89PNG\r\n\x1a\n')
+    _write_png_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    _write_png_chunk(f, b'IDAT', zlib.compress(raw.tobytes(), PNG_COMPRESSION))
+    _write_png_chunk(f, b'IEND', b'')
+
+
+def _write_png_chunk(f, kind, data):
+    f.write(struct.pack('>I', len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
@@ -0,0 +1,94 @@
+import logging
+import os
+import tempfile
+import threading
+
+import caching
+
+
+# rendered images are kept on local disk, named by the hash of everything
+# that determines their content
+DIRECTORY = caching.private_directory('gliders-png')
+MAX_BYTES = 256 * 1024 * 1024
+# the store is scanned once, and then every put adds its size to the total.
+# when the total goes over MAX_BYTES the store is scanned again, since other
+# workers write to it too, and the images are evicted down to this fraction
+# of it, so the scans are rare.
+EVICT_TO = 0.9
+
+_lock = threading.Lock()
+# the bytes in the store of each directory, as this process knows them
+_total = {}
+
+
+def get(key):
+    path = _path(key)
+    try:
+        # the modification time is the last use time, for the LRU eviction
+        os.utime(path, None)
+    except OSError:
+        return None
+    return path
+
+
+def put(key, data):
+    # the image is written to a temporary file and renamed, so readers never
+    # see a partial image
+    fd, tmp = tempfile.mkstemp(dir=DIRECTORY, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    path = _path(key)
+    try:
+        replaced = os.path.getsize(path)
+    except OSError:
+        replaced = 0
+    os.rename(tmp, path)
+    _add(len(data) - replaced)
+    return path
+
+
+def _add(size):
+    with _lock:
+        total = _total.get(DIRECTORY)
+        if total is not None:
+            total += size
+            _total[DIRECTORY] = total
+            if total <= MAX_BYTES:
+                return
+        _total[DIRECTORY] = _evict()
+
+
+def _evict():
+    # scans the store and evicts the least recently used images if it is
+    # over MAX_BYTES. returns the bytes that are left in it.
+    entries = []
+    total = 0
+    for name in os.listdir(DIRECTORY):
+        if not name.endswith('.png'):
+            continue
+        try:
+            stat = os.stat(os.path.join(DIRECTORY, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+        total += stat.st_size
+    if total <= MAX_BYTES:
+        return total
+
+    # remove the least recently used images until the store fits
+    entries.sort()
+    for _, size, name in entries:
+        if total <= MAX_BYTES * EVICT_TO:
+            break
+        logging.info('Evicting image %s', name)
+        try:
+            os.remove(os.path.join(DIRECTORY, name))
+        except OSError:
+            pass
+        total -= size
+    return total
+
+
+def _path(key):
+    return os.path.join(DIRECTORY, key + '.png')
+
@@ -0,0 +1,144 @@
+import collections
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import calc
+import render
+import stations
+
+
+# number of images that are rendered in parallel. it is kept below the
+# render queue size, so that user requests can still be rendered.
+WORKERS = render.WORKERS
+# times to retry an image when the render queue is full
+RETRIES = 3
+# number of runs that are kept for the status
+HISTORY = 20
+
+_lock = threading.Lock()
+_runs = collections.OrderedDict()
+
+
+def start(profile, temp_of, names=None):
+    # render the images of the stations for the sounding profile in the
+    # background. temp_of returns the max temperature of a station record,
+    # names are the stations, all of them by default.
+    with _lock:
+        if profile.key in _runs:
+            return
+        run = _Run(profile, stations.all() if names is None else names)
+        _runs[profile.key] = run
+        while len(_runs) > HISTORY:
+            _runs.popitem(last=False)
+
+    thread = threading.Thread(target=run.run, args=(temp_of,), name='prerender-' + profile.key)
+    thread.daemon = True
+    thread.start()
+
+
+def background(fn, *args):
+    # run a function that fetches data in the background. new soundings that
+    # it fetches are rendered by the fetcher subscribers.
+    def run():
+        try:
+            fn(*args)
+        except Exception:
+            logging.exception('Failed prerender fetch %s%s', fn.__name__, args)
+
+    thread = threading.Thread(target=run, name='prerender-fetch')
+    thread.daemon = True
+    thread.start()
+
+
+def status():
+    with _lock:
+        return [run.status() for run in _runs.values()]
+
+
+class _Run(object):
+
+    def __init__(self, profile, names):
+        self.profile = profile
+        self.names = names
+        self.lock = threading.Lock()
+        self.state = 'pending'
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finished = None
+
+    def run(self, temp_of):
+        logging.info('Prerendering sounding %s', self.profile.key)
+        self.state = 'running'
+        try:
+            self._render(temp_of)
+        except Exception:
+            logging.exception('Failed prerendering sounding %s', self.profile.key)
+            # the run is dropped, so the next publish of the sounding starts
+            # it again
+            with _lock:
+                if _runs.get(self.profile.key) is self:
+                    del _runs[self.profile.key]
+            self.finished = time.time()
+            self.state = 'failed'
+            return
+
+        self.finished = time.time()
+        self.state = 'done'
+        logging.info('Prerendered sounding %s: %d images, %d failed, %.1fs',
+                     self.profile.key, self.done, self.failed, self.finished - self.started)
+
+    def _render(self, temp_of):
+        names = []
+        temps = []
+        for name in self.names:
+            try:
+                temps.append(temp_of(stations.get(name)))
+            except Exception:
+                logging.exception('No temperature for prerendering %s', name)
+                continue
+            names.append(name)
+        self.total = len(names)
+
+        results = calc.calculate_many(
+            self.profile,
+            temps,
+            [stations.get(name)['elevation'] for name in names],
+        )
+
+        pool = ThreadPool(WORKERS)
+        try:
+            pool.map(self._image, zip(names, temps, results))
+        finally:
+            pool.close()
+            pool.join()
+
+    def _image(self, job):
+        name, temp, data = job
+        for attempt in range(RETRIES + 1):
+            try:
+                render.image(self.profile, name, temp, data)
+                with self.lock:
+                    self.done += 1
+                return
+            except render.RenderQueueFullException:
+                time.sleep(render.RETRY_AFTER)
+            except Exception:
+                logging.exception('Failed prerendering %s for %s', name, self.profile.key)
+                break
+        with self.lock:
+            self.failed += 1
+
+    def status(self):
+        end = self.finished or time.time()
+        return {
+            'sounding': self.profile.key,
+            'state': self.state,
+            'total': self.total,
+            'done': self.done,
+            'failed': self.failed,
+            'elapsed': round(end - self.started, 3),
+        }
@@ -0,0 +1,54 @@
+import logging
+import threading
+import time
+
+
+# the upstream data is fetched again in the background on the times it is
+# updated, so requests are served from the cache and never wait for an
+# upstream. every worker runs the jobs, a job that another worker already did
+# since it was due is skipped by the cache.
+_jobs = []
+_lock = threading.Lock()
+_thread = []
+
+
+def schedule(fn, period, offset=0):
+    # fn is called with the time it was due, on every period. the schedule is
+    # aligned to UTC, offset is seconds after the period start.
+    _jobs.append((fn, period, offset))
+
+
+def start():
+    with _lock:
+        if _thread:
+            return
+        thread = threading.Thread(target=_loop, name='refresh')
+        thread.daemon = True
+        thread.start()
+        _thread.append(thread)
+
+
+def due(period, offset=0, now=None):
+    # the last time a job of the period was due
+    if now is None:
+        now = time.time()
+    return now - (now - offset) % period
+
+
+def _loop():
+    done = {}
+    while True:
+        now = time.time()
+        for job in _jobs:
+            fn, period, offset = job
+            since = due(period, offset, now)
+            if done.get(job) == since:
+                continue
+            done[job] = since
+            try:
+                fn(since)
+            except Exception:
+                logging.exception('Failed refreshing %s.%s', fn.__module__, fn.__name__)
+
+        wake = min(due(period, offset) + period for _, period, offset in _jobs)
+        time.sleep(max(wake - time.time(), 1))
@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import threading
+
+from werkzeug import exceptions
+
+import calc
+import httpcache
+import plot
+import pngstore
+import stations
+
+
+class RenderQueueFullException(Exception):
+    pass
+
+
+# number of render processes, and the number of distinct renders that may
+# be in flight before new ones are rejected
+WORKERS = 2
+MAX_QUEUE = 8
+# seconds to wait for a single render
+TIMEOUT = 30
+# seconds a client should wait before retrying when the queue is full
+RETRY_AFTER = 5
+
+_lock = threading.Lock()
+_pool = None
+_pending = {}
+
+
+def key(profile, location_name, temp):
+    station = stations.get(location_name)
+    return httpcache.key(profile.key, location_name, station['elevation'], temp)
+
+
+def image(profile, location_name, temp, data=None):
+    # returns the key and the path of the stored image, rendering it if it
+    # is not in the store. data is the calc.calculate result, if it is
+    # already known.
+    image_key = key(profile, location_name, temp)
+
+    path = pngstore.get(image_key)
+    if path is None:
+        if data is None:
+            station = stations.get(location_name)
+            data = calc.calculate(profile, temp, station['elevation'])
+        path = pngstore.put(image_key, png(image_key, data))
+
+    return image_key, path
+
+
+def png(key, data):
+    # key identifies the rendered image, data is the calc.calculate result
+    with _lock:
+        result = _pending.get(key)
+        if result is None:
+            # a render that timed out is still counted until it is done, the
+            # done ones that no request waits for are dropped here
+            for done in [k for k, r in _pending.items() if r.ready()]:
+                del _pending[done]
+            if len(_pending) >= MAX_QUEUE:
+                logging.warning('Render queue is full, rejecting %s', key)
+                raise RenderQueueFullException()
+            logging.info('Rendering %s', key)
+            result = _get_pool().apply_async(plot.render, (data,))
+            _pending[key] = result
+
+    try:
+        return result.get(TIMEOUT)
+    except multiprocessing.TimeoutError:
+        logging.error('Render timed out: %s', key)
+        raise exceptions.GatewayTimeout('Rendering the sounding timed out')
+    finally:
+        # a render that timed out keeps running in the pool, it is kept in
+        # the queue so a retry waits for it instead of drawing it again
+        with _lock:
+            if _pending.get(key) is result and result.ready():
+                del _pending[key]
+
+
+def _get_pool():
+    # the pool is created on first use, so that every gunicorn worker gets
+    # its own pool after it was forked
+    global _pool
+    if _pool is None:
+        _pool = multiprocessing.Pool(WORKERS, initializer=plot.warm)
+    return _pool
@@ -0,0 +1,136 @@
+import hashlib
+
+import numpy as np
+
+
+# all the soundings are resampled once, when they are fetched, to a fixed
+# height grid [feet]
+BOTTOM, TOP = 0, 15000
+STEP = 100
+HEIGHT = np.arange(BOTTOM, TOP + STEP, STEP, dtype=np.float32)
+
+# the rows of a resampled sounding, in canonical units:
+# pressure [hPa], temperature [C], dew point [C], wind components [knot]
+FIELDS = ('p', 'T', 'Td', 'wind_u', 'wind_v')
+
+FEET_PER_METER = 3.28084
+
+
+class SoundingProfile(object):
+    # an immutable sounding on the fixed height grid. source names where it
+    # came from, and time is the time the sounding is valid for.
+
+    __slots__ = ('source', 'time', 'levels', 'key')
+
+    def __init__(self, source, time, levels):
+        levels = np.array(levels, dtype=np.float32)
+        if levels.shape != (len(FIELDS), len(HEIGHT)):
+            raise ValueError('Unexpected sounding levels shape: {}'.format(levels.shape))
+        levels.setflags(write=False)
+
+        digest = hashlib.sha1(levels.tobytes()).hexdigest()[:12]
+        time_text = time.strftime('%Y%m%d%H') if time is not None else '-'
+
+        object.__setattr__(self, 'source', source)
+        object.__setattr__(self, 'time', time)
+        object.__setattr__(self, 'levels', levels)
+        # key identifies the sounding content, it is used in cache keys
+        object.__setattr__(self, 'key', '{}-{}-{}'.format(source, time_text, digest))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SoundingProfile is immutable')
+
+    def __reduce__(self):
+        return SoundingProfile, (self.source, self.time, self.levels)
+
+    def __eq__(self, other):
+        return isinstance(other, SoundingProfile) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return 'SoundingProfile({})'.format(self.key)
+
+    @property
+    def h(self):
+        return HEIGHT
+
+    @property
+    def p(self):
+        return self.levels[0]
+
+    @property
+    def T(self):
+        return self.levels[1]
+
+    @property
+    def Td(self):
+        return self.levels[2]
+
+    @property
+    def wind_u(self):
+        return self.levels[3]
+
+    @property
+    def wind_v(self):
+        return self.levels[4]
+
+
+def from_columns(source, time, columns):
+    # columns are the parse module sounding columns, in the units of the
+    # upstream text: meters, hPa, C, degrees and knots
+    wind_u, wind_v = wind_components(columns['speed'], columns['direction'])
+    return SoundingProfile(source, time, resample(
+        height=columns['height'] * FEET_PER_METER,
+        p=columns['pressure'],
+        T=columns['temperature'],
+        Td=columns['dewpoint'],
+        wind_u=wind_u,
+        wind_v=wind_v,
+    ))
+
+
+def interpolate(before, after, time):
+    # the sounding of a time between two soundings, blended level by level
+    w = (time - before.time).total_seconds() / (after.time - before.time).total_seconds()
+    return SoundingProfile(before.source, time, before.levels * (1 - w) + after.levels * w)
+
+
+def resample(height, p, T, Td, wind_u, wind_v):
+    # height is in feet, and may not be sorted or may contain missing levels
+    height = np.asarray(height, dtype=np.float64)
+    order = np.argsort(height)
+    height = height[order]
+
+    levels = np.empty((len(FIELDS), len(HEIGHT)), dtype=np.float32)
+    for i, column in enumerate((p, T, Td, wind_u, wind_v)):
+        column = np.asarray(column, dtype=np.float64)[order]
+        valid = np.isfinite(height) & np.isfinite(column)
+        if not valid.any():
+            levels[i] = np.nan
+            continue
+        levels[i] = np.interp(HEIGHT, height[valid], column[valid])
+
+    return levels
+
+
+def wind_components(speed, direction):
+    # direction is where the wind blows from, in degrees
+    direction = np.radians(direction)
+    return -speed * np.sin(direction), -speed * np.cos(direction)
+
+
+def at(values, h):
+    # linear interpolation of grid values at the heights h, by indexing the
+    # uniform grid directly. heights out of the grid get the edge values.
+    x = np.clip((np.asarray(h, dtype=np.float64) - BOTTOM) / STEP, 0, len(HEIGHT) - 1)
+    i = np.minimum(x.astype(int), len(HEIGHT) - 2)
+    w = x - i
+    return values[..., i] * (1 - w) + values[..., i + 1] * w
@@ -1,6 +1,42 @@
+import hashlib
+import json
+import logging
+import numbers
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from scipy import spatial
 import yaml
 from werkzeug import exceptions
 
+import caching
+
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+
+PATH = 'stations.yaml'
+
+# the parsed stations are kept in a json snapshot, that is loaded instead of
+# parsing the yaml again while the yaml is not modified
+DIRECTORY = caching.private_directory('gliders-stations')
+# the version of the snapshot content, a snapshot of another version is
+# compiled again
+SCHEMA = 1
+
+# seconds between checks of the yaml modification time. when it is modified,
+# the registry is swapped with no restart. caches are keyed by the station
+# values, so the values of stations that did not change are still used.
+CHECK_PERIOD = 5
+
+# the stations are indexed by their position on the unit sphere, so the
+# straight distance in the index orders them like the distance on the earth
+EARTH_RADIUS = 6371.0
 
 _KEYS = {
     'coord',
@@ -8,25 +44,35 @@ _KEYS = {
     'temp_max_id',
 }
 
-_STATIONS = {
-    name: val
-    for name, val in yaml.load(open('stations.yaml')).items()
-    if set(val.keys()) >= _KEYS
-}
+_lock = threading.Lock()
+_registry = [None]
+_checked = [0]
+
 
-_ALL = [
-    tup[0] for tup in
-    sorted(
-        _STATIONS.items(),
-        key=lambda tup: tup[1]['coord']['lat'],
-        reverse=True,
-    )
-]
+class _Registry(object):
+
+    def __init__(self, source, stations):
+        # source identifies the version of the yaml the stations were read from
+        self.source = source
+        self.stations = stations
+        self.all = [
+            tup[0] for tup in
+            sorted(
+                stations.items(),
+                key=lambda tup: tup[1]['coord']['lat'],
+                reverse=True,
+            )
+        ]
+        self.names = sorted(stations)
+        self.index = spatial.cKDTree(_position(
+            [stations[name]['coord']['lat'] for name in self.names],
+            [stations[name]['coord']['long'] for name in self.names],
+        ).reshape(-1, 3))
 
 
 def get(name):
     try:
-        station = _STATIONS[name]
+        station = _current().stations[name]
     except KeyError:
         raise exceptions.NotFound('Station not found: {}'.format(name))
 
@@ -34,4 +80,152 @@ def get(name):
 
 
 def all():
-    return _ALL
+    return _current().all
+
+
+def modified():
+    # the modification time of the loaded stations yaml
+    return _current().source[0]
+
+
+def nearest(lat, lon, k=1):
+    # the k nearest stations to the coordinate, with their distance in km
+    registry = _current()
+    k = min(k, len(registry.names))
+    if k < 1:
+        return []
+    chords, indices = registry.index.query(_position(lat, lon), k=[i + 1 for i in range(k)])
+    return [(registry.names[i], _distance(chord)) for chord, i in zip(chords, indices)]
+
+
+def within(lat, lon, radius):
+    # the stations in radius km of the coordinate, nearest first
+    registry = _current()
+    position = _position(lat, lon)
+    chord = 2 * np.sin(min(radius / EARTH_RADIUS, np.pi) / 2)
+    indices = registry.index.query_ball_point(position, chord * (1 + 1e-9))
+    found = [(registry.names[i], _distance(np.linalg.norm(registry.index.data[i] - position))) for i in indices]
+    return sorted(found, key=lambda tup: tup[1])
+
+
+def _current():
+    now = time.time()
+    if _registry[0] is None or now - _checked[0] >= CHECK_PERIOD:
+        _checked[0] = now
+        _reload()
+    return _registry[0]
+
+
+def _reload():
+    with _lock:
+        source = None
+        try:
+            stat = os.stat(PATH)
+            source = (stat.st_mtime, stat.st_size)
+            if _registry[0] is not None and _registry[0].source == source:
+                return
+            stations = _load_snapshot(source)
+            if stations is None:
+                stations = _compile(source)
+        except Exception:
+            # a missing yaml or a broken edit of it keeps the registry that
+            # was loaded
+            if _registry[0] is None:
+                raise
+            logging.exception('Failed reloading %s', PATH)
+            if source is not None:
+                _registry[0].source = source
+            return
+
+        # the registry is swapped in a single assignment, so a request sees
+        # either the old stations or the new ones
+        _registry[0] = _Registry(source, stations)
+        logging.info('Loaded %d stations from %s', len(stations), PATH)
+
+
+def _compile(source):
+    with open(PATH) as f:
+        stations = {
+            name: val
+            for name, val in yaml.load(f, Loader=_Loader).items()
+            if set(val.keys()) >= _KEYS
+        }
+    _check(stations)
+
+    # the snapshot is written to a temporary file and renamed, so readers
+    # never see a partial snapshot
+    try:
+        fd, tmp = tempfile.mkstemp(dir=DIRECTORY, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'schema': SCHEMA, 'source': source, 'stations': stations}, f)
+        os.rename(tmp, _snapshot_path())
+    except (IOError, OSError, TypeError, ValueError):
+        logging.exception('Failed saving the stations snapshot')
+    return stations
+
+
+def _load_snapshot(source):
+    try:
+        with open(_snapshot_path()) as f:
+            snapshot = json.load(f)
+    except (IOError, OSError):
+        return None
+    except ValueError:
+        logging.exception('Failed loading the stations snapshot')
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('schema') != SCHEMA:
+        return None
+    if tuple(snapshot.get('source') or ()) != source:
+        return None
+    try:
+        _check(snapshot['stations'])
+    except (KeyError, ValueError):
+        logging.exception('Ignoring an invalid stations snapshot')
+        return None
+    return snapshot['stations']
+
+
+def _check(stations):
+    # the stations are swapped in only if all of them have the fields that
+    # are used, of the types that are used
+    if not isinstance(stations, dict) or not stations:
+        raise ValueError('No stations')
+    for name, station in stations.items():
+        coord = station.get('coord')
+        if not isinstance(coord, dict):
+            raise ValueError('Station {}: coord is not a mapping'.format(name))
+        if not _number(coord.get('lat')) or not -90 <= coord['lat'] <= 90:
+            raise ValueError('Station {}: invalid lat {!r}'.format(name, coord.get('lat')))
+        if not _number(coord.get('long')) or not -180 <= coord['long'] <= 180:
+            raise ValueError('Station {}: invalid long {!r}'.format(name, coord.get('long')))
+        if not _number(station.get('elevation')):
+            raise ValueError('Station {}: invalid elevation {!r}'.format(name, station.get('elevation')))
+        if not isinstance(station.get('temp_max_id'), numbers.Integral) or isinstance(station['temp_max_id'], bool):
+            raise ValueError('Station {}: invalid temp_max_id {!r}'.format(name, station.get('temp_max_id')))
+
+
+def _number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and value == value
+
+
+def _snapshot_path():
+    # a snapshot per yaml file, for checkouts that share the temp directory
+    digest = hashlib.sha1(os.path.abspath(PATH).encode('utf-8')).hexdigest()
+    return os.path.join(DIRECTORY, 'stations-{}.json'.format(digest[:12]))
+
+
+def _position(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat),
+    ], axis=-1)
+
+
+def _distance(chord):
+    # the distance on the earth of a straight distance on the unit sphere
+    return float(2 * EARTH_RADIUS * np.arcsin(min(chord / 2, 1.0)))
+
+
+_current()
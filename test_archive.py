@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import archive
+import uwyo
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = archive.DIRECTORY
+        archive.DIRECTORY = tempfile.mkdtemp()
+        time_ = datetime(2018, 7, 10, 12)
+        self.profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), time_)
+
+    def tearDown(self):
+        shutil.rmtree(archive.DIRECTORY)
+        archive.DIRECTORY = self.directory
+
+    def test_sounding(self):
+        self.assertIsNone(archive.load_sounding('uwyo', '40179', self.profile.time))
+
+        archive.save_sounding(self.profile, '40179')
+
+        loaded = archive.load_sounding('uwyo', '40179', self.profile.time)
+        self.assertEqual(loaded, self.profile)
+        self.assertEqual(loaded.time, self.profile.time)
+        self.assertIsNone(archive.load_sounding('uwyo', '40180', self.profile.time))
+        self.assertIsNone(archive.load_sounding('noaa', '40179', self.profile.time))
+
+    def test_max_age(self):
+        archive.save_sounding(self.profile, '40179')
+        path = archive._sounding_path('uwyo', '40179', self.profile.time)
+        os.utime(path, (time.time() - 120, time.time() - 120))
+
+        self.assertIsNone(archive.load_sounding('uwyo', '40179', self.profile.time, max_age=60))
+        self.assertEqual(archive.load_sounding('uwyo', '40179', self.profile.time, max_age=180), self.profile)
+
+    def test_schema_mismatch(self):
+        path = archive._sounding_path('uwyo', '40179', self.profile.time)
+        archive._save(path, np.zeros((3, 10), dtype=np.float32))
+        self.assertIsNone(archive.load_sounding('uwyo', '40179', self.profile.time))
+
+        archive._makedirs(os.path.dirname(archive._forecast_path(513)))
+        with open(archive._forecast_path(513), 'wb') as f:
+            f.write(b'not an npy file')
+        self.assertIsNone(archive.load_forecast(513))
+
+    def test_forecast(self):
+        hourly = np.arange(24, dtype=np.float32)
+        forecast = {'2018-07-10': (32, hourly), '2018-07-11': (34, hourly + 1), '2018-07-12': (-2, hourly - 1)}
+        self.assertIsNone(archive.load_forecast(513))
+
+        archive.save_forecast(513, forecast)
+
+        for station_id in (513, '513'):
+            loaded = archive.load_forecast(station_id)
+            self.assertEqual(set(loaded), set(forecast))
+            for date, (temp_max, hourly) in forecast.items():
+                self.assertEqual(loaded[date][0], temp_max)
+                np.testing.assert_array_equal(loaded[date][1], hourly)
+
+    def test_forecast_old_schema(self):
+        # forecasts that were archived before the hourly temperatures
+        path = archive._forecast_path(513)
+        archive._save(path, np.array([('2018-07-10', 32)], dtype=[('date', 'S10'), ('temp_max', '<i2')]))
+        self.assertIsNone(archive.load_forecast(513))
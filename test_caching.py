@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+import uuid
+
+import caching
+
+
+_calls = []
+_offset = [0]
+
+
+@caching.cache('test-caching', expire=60)
+def _square(x):
+    _calls.append(x)
+    return x * x + _offset[0]
+
+
+class TestCaching(unittest.TestCase):
+
+    def setUp(self):
+        del _calls[:]
+        _offset[0] = 0
+
+    def test_cache(self):
+        x = uuid.uuid4().int
+        self.assertEqual(_square(x), x * x)
+        self.assertEqual(_square(x), x * x)
+        self.assertEqual(_calls, [x])
+
+    def test_shared_between_processes(self):
+        x = uuid.uuid4().int
+        pool = multiprocessing.Pool(1)
+        try:
+            self.assertEqual(pool.apply(_square, (x,)), x * x)
+        finally:
+            pool.close()
+            pool.join()
+
+        # the value was filled by the other process
+        self.assertEqual(_square(x), x * x)
+        self.assertEqual(_calls, [])
+
+    def test_refresh(self):
+        x = uuid.uuid4().int
+        self.assertEqual(_square(x), x * x)
+
+        _offset[0] = 1
+        _square.refresh(time.time(), x)
+        self.assertEqual(_square(x), x * x + 1)
+        self.assertEqual(_calls, [x, x])
+
+        # the value was already filled after since
+        _offset[0] = 2
+        _square.refresh(time.time() - 10, x)
+        self.assertEqual(_square(x), x * x + 1)
+        self.assertEqual(_calls, [x, x])
+
+    def test_recent(self):
+        x = uuid.uuid4().int
+        _square(x)
+        self.assertIn((x,), _square.recent())
+
+    def test_put(self):
+        x = uuid.uuid4().int
+        _square.put(7, x)
+        self.assertEqual(_square(x), 7)
+        self.assertEqual(_calls, [])
+
+    def test_stored(self):
+        x = uuid.uuid4().int
+        self.assertIsNone(_square.stored(x))
+        before = time.time()
+        _square(x)
+        self.assertGreaterEqual(_square.stored(x), before - 1)
+        self.assertLessEqual(_square.stored(x), time.time())
+
+
+class TestPrivateDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.name = 'gliders-test-{}'.format(uuid.uuid4().hex)
+        self.path = os.path.join(tempfile.gettempdir(), self.name)
+
+    def tearDown(self):
+        if os.path.islink(self.path):
+            os.remove(self.path)
+        elif os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+    def test_private(self):
+        self.assertEqual(caching.private_directory(self.name), self.path)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o700)
+
+        # a directory that others can write to is made private
+        os.chmod(self.path, 0o777)
+        caching.private_directory(self.name)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o700)
+
+    def test_symlink(self):
+        target = tempfile.mkdtemp()
+        try:
+            os.symlink(target, self.path)
+            with self.assertRaises(RuntimeError):
+                caching.private_directory(self.name)
+        finally:
+            shutil.rmtree(target)
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import calc
+import uwyo
+
+
+class TestCalc(unittest.TestCase):
+
+    def setUp(self):
+        self.data = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+
+    def test_calculate(self):
+        result = calc.calculate(self.data, 32, 186)
+
+        self.assertEqual(len(result['height']), len(result['temp']))
+        self.assertEqual(len(result['height']), len(result['wind_u']))
+        self.assertLessEqual(result['height'].max(), calc._LIM_H[1])
+        np.testing.assert_allclose(result['temp_max'], 32 + calc.M * (result['height'] - 186), atol=1e-4)
+        self.assertGreater(result['tol'], 186)
+        self.assertLess(result['tol_minus_3'], result['tol'])
+
+    def test_hotter_day_is_higher(self):
+        cold = calc.calculate(self.data, 28, 186)
+        hot = calc.calculate(self.data, 36, 186)
+        self.assertGreater(hot['tol'], cold['tol'])
+        self.assertGreater(hot['cloud_base'], cold['cloud_base'])
+        self.assertEqual(hot['trig_0'], cold['trig_0'])
+
+    def test_calculate_many(self):
+        t0s = [32, 28, 36, 30]
+        h0s = [186, -1233, 3070, 0]
+        results = calc.calculate_many(self.data, t0s, h0s)
+
+        self.assertEqual(len(results), len(t0s))
+        for result, t0, h0 in zip(results, t0s, h0s):
+            expected = _reference(self.data, t0, h0)
+            for key in ('tol', 'tol_minus_3', 'cloud_base', 'trig_0'):
+                self.assertAlmostEqual(result[key], expected[key], places=3)
+            np.testing.assert_allclose(result['temp_max'], expected['temp_max'], atol=1e-4)
+
+    def test_crossing_matches_interp(self):
+        height = np.linspace(0, 15000, 50)
+        diff = np.array([10 - height * 1e-3, height * 0 + 1, height * 0 - 1])
+        tol = calc._crossing(diff, height)
+        self.assertAlmostEqual(tol[0], np.interp(0, diff[0][::-1], height[::-1]))
+        self.assertEqual(tol[1], height[-1])
+        self.assertEqual(tol[2], height[0])
+
+    def test_sensitivity(self):
+        deltas = [-2, 0, 2]
+        sweep = calc.sensitivity(self.data, 32, 186, deltas)
+
+        for i, delta in enumerate(deltas):
+            expected = calc.calculate(self.data, 32 + delta, 186)
+            self.assertAlmostEqual(sweep['tol'][i], expected['tol'])
+            self.assertAlmostEqual(sweep['tol_minus_3'][i], expected['tol_minus_3'])
+            self.assertAlmostEqual(sweep['cloud_base'][i], expected['cloud_base'])
+
+    def test_timeline(self):
+        t0s = np.array([18, 24, np.nan, 33], dtype=np.float32)
+        timeline = calc.timeline(self.data, t0s, 186)
+
+        for i, t0 in enumerate(t0s):
+            if np.isnan(t0):
+                continue
+            expected = calc.calculate(self.data, t0, 186)
+            self.assertAlmostEqual(timeline['tol'][i], expected['tol'])
+            self.assertAlmostEqual(timeline['tol_minus_3'][i], expected['tol_minus_3'])
+            self.assertEqual(timeline['trigger'][i], t0 > expected['trig_0'])
+        self.assertTrue(np.isnan(timeline['tol'][2]))
+        self.assertFalse(timeline['trigger'][2])
+        self.assertFalse(timeline['trigger'][0])
+        self.assertTrue(timeline['trigger'][3])
+
+        # the trigger temperature itself is not triggered, like on the dashboard
+        trig_0 = timeline['trig_0']
+        self.assertFalse(calc.timeline(self.data, [trig_0], 186)['trigger'][0])
+
+
+def _reference(data, t0, h0):
+    # a single station, with a np.interp per value, like calculate was before
+    # it was batched
+    height, temp, dew = data.h, data.T, data.Td
+    temp_max = t0 + calc.M * (height - h0)
+    trig_h = np.interp(calc.H_TRIGGER, height, temp)
+    # the heights are reversed so the temperature difference is increasing
+    # for np.interp
+    diff = (temp_max - temp)[::-1]
+    return {
+        'temp_max': temp_max,
+        'cloud_base': 1000.0 / 2.5 * (t0 - np.interp(h0, height, dew)) + h0,
+        'trig_0': trig_h + calc.M * (h0 - calc.H_TRIGGER),
+        'tol': np.interp(0, diff, height[::-1]),
+        'tol_minus_3': np.interp(0, diff - 3, height[::-1]),
+    }
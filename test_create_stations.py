@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import create_stations
+
+
+class TestElevations(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = os.path.join(self.directory, 'elevations.json')
+        self.dem = os.path.join(self.directory, 'dem.npz')
+        lat = np.array([32.0, 33.0])
+        lon = np.array([35.0, 36.0])
+        np.savez(self.dem, lat=lat, lon=lon, elevation=np.array([[0.0, 100.0], [200.0, 300.0]]))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_dem(self):
+        result = create_stations._elevations([(32.5, 35.5), (32.0, 35.25), (40.0, 35.0)], self.cache, self.dem)
+        self.assertAlmostEqual(result[create_stations._key(32.5, 35.5)], 150)
+        self.assertAlmostEqual(result[create_stations._key(32.0, 35.25)], 25)
+        # out of the grid
+        self.assertNotIn(create_stations._key(40.0, 35.0), result)
+
+    def test_cache(self):
+        create_stations._save_cache(self.cache, {create_stations._key(40.0, 35.0): 12.5})
+        # a cached elevation is used with no lookup, even out of the DEM
+        result = create_stations._elevations([(40.0, 35.0)], self.cache, self.dem)
+        self.assertEqual(result, {create_stations._key(40.0, 35.0): 12.5})
+        result = create_stations._elevations([(40.0, 35.0)], self.cache)
+        self.assertEqual(result, {create_stations._key(40.0, 35.0): 12.5})
+
+    def test_failed_batch(self):
+        def lookup(keys):
+            if keys[0] == create_stations._key(31.0, 35.0):
+                raise IOError('lookup failed')
+            return dict((key, 10.0) for key in keys)
+
+        saved = create_stations._lookup, create_stations.BATCH
+        create_stations._lookup, create_stations.BATCH = lookup, 1
+        try:
+            result = create_stations._elevations([(31.0, 35.0), (32.0, 35.0), (33.0, 35.0)], self.cache)
+        finally:
+            create_stations._lookup, create_stations.BATCH = saved
+
+        # the batches that were resolved are in the saved cache
+        expected = {create_stations._key(32.0, 35.0): 10.0, create_stations._key(33.0, 35.0): 10.0}
+        self.assertEqual(result, expected)
+        self.assertEqual(create_stations._load_cache(self.cache), expected)
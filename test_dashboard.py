@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+
+import dashboard
+import uwyo
+
+
+class TestDashboard(unittest.TestCase):
+
+    def setUp(self):
+        dashboard._rows.clear()
+        time_ = datetime(2018, 7, 10, 12)
+        self.profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), time_)
+
+    def tearDown(self):
+        dashboard._rows.clear()
+
+    def test_update(self):
+        names = ['a', 'b']
+        dashboard._update(self.profile, names, [(self.profile.key, 30, 100), (self.profile.key, 32, 200)])
+        b = dashboard._rows['b']
+
+        dashboard._update(self.profile, names, [(self.profile.key, 34, 100), (self.profile.key, 32, 200)])
+        # only the station whose inputs changed is computed again
+        self.assertIs(dashboard._rows['b'], b)
+        self.assertEqual(dashboard._rows['a'][1]['t0'], 34)
+
+        dashboard._update(self.profile, ['a'], [(self.profile.key, 34, 100)])
+        self.assertEqual(list(dashboard._rows), ['a'])
+
+    def test_locations(self):
+        names = ['a', 'b']
+        dashboard._update(self.profile, names, [(self.profile.key, 30, 100), (self.profile.key, 36, 100)])
+        rows = dict(dashboard._rows)
+        locations = dashboard.locations_of(rows, names)
+        self.assertEqual([loc['name'] for loc in locations], names)
+        self.assertEqual(locations[1]['tol_percent'], 100)
+        self.assertLess(locations[0]['tol_percent'], 100)
+        self.assertEqual(locations[0]['elevation'], 100)
+
+        snapshot = dashboard.Snapshot('v1', self.profile.time, rows, locations, '')
+        self.assertIn('"version": "v1"', snapshot.json)
+
+        # a newer version does not change the views of the snapshot
+        dashboard._update(self.profile, ['a'], [(self.profile.key, 34, 100)])
+        region = dashboard.locations_of(snapshot.rows, ['b'])
+        self.assertEqual(region[0]['data']['t0'], 36)
@@ -0,0 +1,44 @@
+import json
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import calc
+import encode
+import uwyo
+
+
+class TestEncode(unittest.TestCase):
+
+    def setUp(self):
+        profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+        self.data = calc.calculate(profile, 32, 186)
+
+    def test_to_json(self):
+        result = encode.to_json(self.data)
+
+        self.assertEqual(set(result), set(encode.SCALARS + encode.ARRAYS))
+        self.assertEqual(result['tol'], int(round(self.data['tol'])))
+        self.assertIsInstance(result['height'][1], int)
+        self.assertEqual(result['temp'][0], round(float(self.data['temp'][0]), 1))
+
+    def test_to_json_nan(self):
+        data = dict(self.data)
+        data['cloud_base'] = np.nan
+        data['dew'] = np.where(np.arange(len(self.data['dew'])) % 2, np.nan, self.data['dew'])
+        result = encode.to_json(data)
+
+        self.assertIsNone(result['cloud_base'])
+        self.assertIsNone(result['dew'][1])
+        self.assertEqual(result['dew'][0], round(float(self.data['dew'][0]), 1))
+        # strict json has no NaN
+        json.dumps(result, allow_nan=False)
+
+    def test_to_f32(self):
+        values = np.frombuffer(encode.to_f32(self.data), dtype='<f4')
+        scalars = values[:len(encode.SCALARS)]
+        arrays = values[len(encode.SCALARS):].reshape(len(encode.ARRAYS), -1)
+
+        self.assertAlmostEqual(scalars[encode.SCALARS.index('tol')], self.data['tol'], places=2)
+        np.testing.assert_allclose(arrays[encode.ARRAYS.index('temp_max')], self.data['temp_max'], rtol=1e-6)
@@ -10,7 +10,7 @@ import ims
 class TestFetch(unittest.TestCase):
 
     def test_noaa(self):
-        d = noaa.data(datetime.now())
+        d = noaa.data(datetime.now(), {'lat': 32.597, 'long': 35.278})
         self._test_data(d[0])
 
     def test_uwyo(self):
@@ -50,3 +50,8 @@ class TestFetch(unittest.TestCase):
         with self.assertRaises(ims.NoForecastForDateException):
             in_four_days = now + timedelta(days=4)
             ims.temp_forecast({'temp_max_id': '513'}, in_four_days)
+
+    def test_prefetch(self):
+        ims.prefetch([{'temp_max_id': '513'}, {'temp_max_id': '513'}])
+        data = ims.temp_max({'temp_max_id': '513'})
+        self.assertIsNotNone(data)
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import archive
+import history
+import stations
+import uwyo
+
+
+def _record(args):
+    directory, time_, names = args
+    history.DIRECTORY = directory
+    history.record(uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), time_), names)
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directories = archive.DIRECTORY, history.DIRECTORY
+        archive.DIRECTORY = tempfile.mkdtemp()
+        history.DIRECTORY = tempfile.mkdtemp()
+        time_ = datetime(2018, 7, 10, 12)
+        self.profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), time_)
+        self.names = stations.all()[:2]
+
+    def tearDown(self):
+        shutil.rmtree(archive.DIRECTORY)
+        shutil.rmtree(history.DIRECTORY)
+        archive.DIRECTORY, history.DIRECTORY = self.directories
+
+    def test_record(self):
+        history.record(self.profile, self.names)
+        history.record(self.profile, self.names)
+
+        for name in self.names:
+            rows = history.query(name, datetime(2018, 7, 10), datetime(2018, 7, 11))
+            self.assertEqual(len(rows['time']), 1)
+            self.assertEqual(rows['time'][0], np.datetime64('2018-07-10T12', 'h'))
+            # there is no archived forecast, t0 is estimated from the sounding
+            self.assertTrue(rows['estimated'][0])
+            self.assertFalse(np.isnan(rows['tol'][0]))
+
+        rows = history.query(self.names[0], datetime(2018, 7, 11), datetime(2018, 7, 12))
+        self.assertEqual(len(rows['time']), 0)
+
+    def test_forecast_t0(self):
+        station = stations.get(self.names[0])
+        archive.save_forecast(station['temp_max_id'], {'2018-07-10': (35, np.full(24, np.nan, dtype=np.float32))})
+        self.assertEqual(history.t0(self.profile, station), (35.0, False))
+
+    def test_aggregate(self):
+        history.record(self.profile, self.names)
+        rows = history.query(self.names[0], datetime(2018, 7, 10), datetime(2018, 7, 11))
+
+        result = history.aggregate(self.names[0], datetime(2018, 7, 10), datetime(2018, 7, 11))
+        self.assertEqual(result['count'], 1)
+        self.assertAlmostEqual(result['tol']['mean'], float(rows['tol'][0]))
+        self.assertEqual(result['tol']['min'], result['tol']['max'])
+
+        result = history.aggregate(self.names[0], datetime(2018, 7, 11), datetime(2018, 7, 12))
+        self.assertEqual(result, {'count': 0, 't0': None, 'trig_0': None, 'tol': None, 'tol_minus_3': None, 'cloud_base': None})
+
+    def test_partial_row(self):
+        history.record(self.profile, self.names[:1])
+        # an append that was cut after the first column
+        with open(os.path.join(history._directory(self.names[0]), 'time'), 'ab') as f:
+            f.write(np.array([np.datetime64('2018-07-11T00', 'h')]).tobytes())
+        self.assertEqual(len(history._read(self.names[0])['time']), 1)
+
+        history.record(uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 11, 12)), self.names[:1])
+        rows = history.query(self.names[0], datetime(2018, 7, 1), datetime(2018, 8, 1))
+        self.assertEqual(list(rows['time'].astype(datetime)), [datetime(2018, 7, 10, 12), datetime(2018, 7, 11, 12)])
+
+    def test_record_processes(self):
+        # processes that record the same soundings at once append each once
+        times = [datetime(2018, 7, day, 12) for day in range(10, 14)]
+        pool = multiprocessing.Pool(4)
+        try:
+            pool.map(_record, [(history.DIRECTORY, time_, self.names) for time_ in times * 4])
+        finally:
+            pool.close()
+            pool.join()
+
+        for name in self.names:
+            rows = history.query(name, datetime(2018, 7, 1), datetime(2018, 8, 1))
+            self.assertEqual(list(rows['time'].astype(datetime)), times)
+            self.assertFalse(np.isnan(rows['tol']).any())
@@ -0,0 +1,72 @@
+import time
+import unittest
+from datetime import datetime
+
+import flask
+
+import httpcache
+import refresh
+
+
+class TestHttpcache(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+    def test_key(self):
+        key = httpcache.key('uwyo-2018071012-abc', 'Megido', 186, 32)
+        self.assertEqual(key, httpcache.key('uwyo-2018071012-abc', 'Megido', 186, 32))
+        self.assertNotEqual(key, httpcache.key('uwyo-2018071012-abc', 'Megido', 186, 33))
+
+    def test_max_age(self):
+        period = 60 * 60
+        age = httpcache.max_age(period)
+        now = time.time()
+        self.assertLessEqual(age, max(refresh.due(period, now=now) + period - now, httpcache.SHORT_MAX_AGE) + 1)
+        self.assertLessEqual(httpcache.max_age(period, 15 * 60), httpcache.max_age(15 * 60) + 1)
+
+    def test_last_modified(self):
+        now = time.time()
+        self.assertEqual(httpcache.last_modified(now - 120, now - 60), datetime.utcfromtimestamp(now - 60))
+        # a time in the future is not a modification time
+        self.assertLessEqual(httpcache.last_modified(now + 60), datetime.utcnow())
+        self.assertIsNone(httpcache.last_modified())
+        self.assertIsNone(httpcache.last_modified(now, None))
+
+    def test_updated(self):
+        modified = time.time() - 60 * 60
+        with self.app.test_request_context('/'):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,), [modified])
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.cache_control.public)
+            self.assertEqual(resp.last_modified.replace(tzinfo=None), datetime.utcfromtimestamp(int(modified)))
+
+        with self.app.test_request_context('/'):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,), [modified, None])
+            self.assertIsNone(resp.last_modified)
+
+        with self.app.test_request_context('/', headers={'If-None-Match': '"etag"'}):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,))
+            self.assertEqual(resp.status_code, 304)
+
+        with self.app.test_request_context('/', headers={'If-None-Match': '"other"'}):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,))
+            self.assertEqual(resp.status_code, 200)
+
+    def test_modified_since(self):
+        modified = time.time() - 60 * 60
+        since = datetime.utcfromtimestamp(modified + 60).strftime('%a, %d %b %Y %H:%M:%S GMT')
+        with self.app.test_request_context('/', headers={'If-Modified-Since': since}):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,), [modified])
+            self.assertEqual(resp.status_code, 304)
+        # an input that was stored after the client got the response
+        with self.app.test_request_context('/', headers={'If-Modified-Since': since}):
+            resp = httpcache.updated(flask.make_response('data'), 'etag', (60 * 60,), [modified, modified + 120])
+            self.assertEqual(resp.status_code, 200)
+
+    def test_content_etag(self):
+        with self.app.test_request_context('/'):
+            etag = httpcache.conditional(flask.make_response('data')).get_etag()[0]
+        with self.app.test_request_context('/', headers={'If-None-Match': '"{}"'.format(etag)}):
+            self.assertEqual(httpcache.conditional(flask.make_response('data')).status_code, 304)
+            self.assertEqual(httpcache.conditional(flask.make_response('other')).status_code, 200)
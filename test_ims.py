@@ -0,0 +1,72 @@
+import json
+import logging
+import unittest
+
+import numpy as np
+
+import ims
+
+
+class _Records(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class TestIms(unittest.TestCase):
+
+    def setUp(self):
+        self.data = json.load(open('testdata/ims-forecast-209.json'))
+
+    def test_parse(self):
+        forecast = ims._parse(self.data)
+
+        self.assertEqual(sorted(forecast), ['2018-07-10', '2018-07-11', '2018-07-12'])
+        temp_max, hourly = forecast['2018-07-10']
+        self.assertEqual(temp_max, 33)
+        self.assertEqual(hourly.dtype, np.float32)
+        self.assertEqual(len(hourly), 24)
+        # the forecast hours as given, the hours between them interpolated,
+        # and the hours out of them as the nearest forecast hour
+        self.assertEqual(hourly[14], 33)
+        self.assertAlmostEqual(hourly[12], 31 + 2 / 3.0, places=4)
+        self.assertEqual(hourly[0], 23)
+        self.assertEqual(hourly[23], 24)
+
+        temp_max, hourly = forecast['2018-07-11']
+        self.assertEqual(temp_max, 34)
+        self.assertEqual(hourly[8], 29)
+
+        # a date with no hours
+        temp_max, hourly = forecast['2018-07-12']
+        self.assertEqual(temp_max, 32)
+        self.assertTrue(np.isnan(hourly).all())
+
+    def test_hourly_invalid(self):
+        hourly = ims._hourly({'02:00': {'temperature': '20'}, '05:00': {'temperature': ''}, 'x': {'temperature': '30'}, '08:00': None})
+        self.assertTrue((hourly == 20).all())
+        self.assertTrue(np.isnan(ims._hourly(None)).all())
+
+    def test_layout_warning(self):
+        records = _Records()
+        logging.getLogger().addHandler(records)
+        try:
+            ims._parse(self.data)
+            self.assertEqual(records.messages, [])
+
+            # hours in a layout that is not the parsed one
+            data = json.loads(json.dumps(self.data))
+            for date_forecast in data.values():
+                for hour_forecast in (date_forecast.get('hourly') or {}).values():
+                    hour_forecast['temp'] = hour_forecast.pop('temperature')
+            forecast = ims._parse(data)
+        finally:
+            logging.getLogger().removeHandler(records)
+
+        self.assertTrue(np.isnan(forecast['2018-07-10'][1]).all())
+        self.assertIn('No hours could be parsed of the IMS hourly forecast of 2018-07-10', records.messages)
+        self.assertIn('The IMS forecast has no hourly temperatures of any date', records.messages)
@@ -0,0 +1,87 @@
+import json
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import ims
+import main
+import noaa
+import stations
+import uwyo
+
+
+class TestTimeline(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+        # the upstreams are replaced by the recorded sounding and a fixed
+        # hourly forecast
+        self.saved = uwyo.data, ims.temp_hourly, noaa.data
+        uwyo.data = lambda: (self.profile, self.profile.time)
+        ims.temp_hourly = lambda station, date: np.linspace(20, 32, 24).astype(np.float32)
+        self.client = main.app.test_client()
+
+    def tearDown(self):
+        uwyo.data, ims.temp_hourly, noaa.data = self.saved
+
+    def test_timeline(self):
+        resp = self.client.get('/api/timeline/Megido')
+        self.assertEqual(resp.status_code, 200)
+        timeline = json.loads(resp.data.decode('utf-8'))
+        self.assertEqual(timeline['location'], 'Megido')
+        self.assertEqual(timeline['h0'], stations.get('Megido')['elevation'])
+        self.assertEqual(timeline['hours'], list(range(24)))
+        self.assertEqual(len(timeline['tol']), 24)
+        self.assertEqual(timeline['t0s'][0], 20)
+
+        self.assertEqual(self.client.get('/api/timeline/Nowhere').status_code, 404)
+
+    def test_no_forecast(self):
+        def no_forecast(station, date):
+            raise ims.NoForecastForDateException()
+        ims.temp_hourly = no_forecast
+        self.assertEqual(self.client.get('/api/timeline/Megido').status_code, 404)
+
+    def test_forecast(self):
+        noaa.data = lambda date, coord: (self.profile, self.profile.time)
+        self.assertEqual(self.client.get('/api/timeline/Megido/11-07-2018').status_code, 200)
+
+        def no_sounding(date, coord):
+            raise noaa.NoSoundingDataException()
+        noaa.data = no_sounding
+        self.assertEqual(self.client.get('/api/timeline/Megido/11-07-2018').status_code, 404)
+
+        # a date out of the forecast range, it fails before any fetch
+        noaa.data = self.saved[2]
+        self.assertEqual(self.client.get('/api/timeline/Megido/11-07-2099').status_code, 404)
+
+
+class TestArgs(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+        self.saved = uwyo.data, ims.temp_max, ims.prefetch
+        uwyo.data = lambda: (self.profile, self.profile.time)
+        ims.temp_max = lambda station: 30
+        ims.prefetch = lambda records: None
+        self.client = main.app.test_client()
+
+    def tearDown(self):
+        uwyo.data, ims.temp_max, ims.prefetch = self.saved
+
+    def test_nearest(self):
+        resp = self.client.get('/api/nearest?lat=32.6&lon=35.2&k=2')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(json.loads(resp.data.decode('utf-8'))), 2)
+
+        for query in ['lat=nan&lon=35', 'lat=32&lon=inf', 'lat=95&lon=35', 'lat=32&lon=-181',
+                      'lat=32&lon=35&k=0', 'lat=32&lon=35&k=x', 'lat=32', 'lat=x&lon=35']:
+            self.assertEqual(self.client.get('/api/nearest?' + query).status_code, 400, query)
+
+    def test_region(self):
+        self.assertEqual(self.client.get('/?lat=32.6&lon=35.2&radius=50').status_code, 200)
+
+        for query in ['lat=nan&lon=35&radius=10', 'lat=-91&lon=35&radius=10', 'lat=32&lon=35&radius=-1',
+                      'lat=32&lon=35&radius=inf', 'lat=32&lon=35']:
+            self.assertEqual(self.client.get('/?' + query).status_code, 400, query)
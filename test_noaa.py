@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import datetime
+from datetime import timedelta
+
+import requests
+
+import archive
+import noaa
+
+
+class _Response(object):
+    # a response that has no sounding of the requested time
+    text = ''
+
+    def raise_for_status(self):
+        pass
+
+
+class TestNoaa(unittest.TestCase):
+
+    def test_grid_cell(self):
+        self.assertEqual(noaa.grid_cell({'lat': 32.597, 'long': 35.278}), (32.5, 35.5))
+        self.assertEqual(noaa.grid_cell({'lat': 32.76, 'long': 35.24}), (33.0, 35.0))
+        self.assertEqual(noaa.grid_cell({'lat': -0.2, 'long': 0.2}), (0.0, 0.0))
+        # nearby stations share a cell
+        self.assertEqual(
+            noaa.grid_cell({'lat': 32.799, 'long': 35.049}),
+            noaa.grid_cell({'lat': 32.9, 'long': 34.9}),
+        )
+
+    def test_prefetch(self):
+        calls = []
+        lock = threading.Lock()
+
+        def record(cell, time):
+            with lock:
+                calls.append((cell, time))
+
+        prefetch = noaa._prefetch
+        noaa._prefetch = record
+        try:
+            date = datetime.now().replace(hour=13, minute=20) + timedelta(days=1)
+            noaa.prefetch([
+                {'lat': 32.597, 'long': 35.278},
+                {'lat': 32.6, 'long': 35.3},
+                {'lat': 31.252973, 'long': 34.7915},
+            ], date)
+        finally:
+            noaa._prefetch = prefetch
+
+        # a fetch per cell, of the GFS cycle of the date
+        time = date.replace(hour=12, minute=0, second=0, microsecond=0)
+        self.assertEqual(sorted(calls), [((31.5, 35.0), time), ((32.5, 35.5), time)])
+
+    def test_partial_response(self):
+        directory, get = archive.DIRECTORY, requests.get
+        archive.DIRECTORY = tempfile.mkdtemp()
+        requests.get = lambda url, timeout: _Response()
+        try:
+            # a cell of its own, so no other test filled its cache
+            cell = (float(uuid.uuid4().int % 900) / 10, 0.0)
+            time = noaa.data_time(datetime.now())
+            with self.assertRaises(noaa.NoSoundingDataException):
+                noaa._sounding(cell, time)
+            # the failed fill was not cached
+            self.assertIsNone(noaa._sounding.stored(cell, time))
+        finally:
+            shutil.rmtree(archive.DIRECTORY)
+            archive.DIRECTORY, requests.get = directory, get
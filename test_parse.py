@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import parse
+
+
+class TestParse(unittest.TestCase):
+
+    def test_uwyo(self):
+        columns = parse.uwyo(open('testdata/uwyo-40179-2018071012.html', 'rb').read())
+
+        self.assertEqual(set(columns), set(parse.COLUMNS))
+        self.assertEqual(len(columns['height']), 25)
+        self.assertEqual(columns['pressure'][0], 1006.0)
+        self.assertEqual(columns['height'][0], 35)
+        self.assertEqual(columns['temperature'][0], 30.2)
+        self.assertEqual(columns['direction'][0], 290)
+        self.assertEqual(columns['speed'][0], 11)
+        # the last level has only a temperature
+        self.assertEqual(columns['temperature'][-1], -63.9)
+        self.assertTrue(np.isnan(columns['dewpoint'][-1]))
+
+    def test_uwyo_no_table(self):
+        self.assertIsNone(parse.uwyo(b'<HTML><BODY>Can\'t get 40179 BET DAGAN Observations</BODY></HTML>'))
+
+    def test_noaa(self):
+        columns = parse.noaa(open('testdata/noaa-gfs-2018061012.txt').read())
+
+        self.assertEqual(len(columns['height']), 31)
+        self.assertEqual(columns['pressure'][0], 1000.0)
+        self.assertEqual(columns['height'][0], 69)
+        self.assertAlmostEqual(columns['temperature'][0], 28.1)
+        self.assertAlmostEqual(columns['dewpoint'][0], 18.1)
+        self.assertEqual(columns['direction'][0], 256)
+        self.assertEqual(columns['speed'][0], 13)
+        # missing values
+        self.assertTrue(np.isnan(columns['dewpoint'][-1]))
+
+    def test_noaa_soundings(self):
+        soundings = parse.noaa_soundings(open('testdata/noaa-gfs-2018061012-bulk.txt').read())
+
+        self.assertEqual([time for time, _ in soundings], [
+            datetime(2018, 6, 10, 12),
+            datetime(2018, 6, 10, 15),
+            datetime(2018, 6, 10, 18),
+        ])
+        single = parse.noaa(open('testdata/noaa-gfs-2018061012.txt').read())
+        for name in parse.COLUMNS:
+            np.testing.assert_array_equal(soundings[0][1][name], single[name])
+        self.assertAlmostEqual(soundings[1][1]['temperature'][0], 29.1)
+        self.assertAlmostEqual(soundings[2][1]['temperature'][0], 30.1)
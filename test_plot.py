@@ -0,0 +1,31 @@
+import struct
+import unittest
+from datetime import datetime
+
+import calc
+import plot
+import uwyo
+
+
+class TestPlot(unittest.TestCase):
+
+    def setUp(self):
+        self.data = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+
+    def tearDown(self):
+        plot.close()
+
+    def test_render(self):
+        png = plot.render(calc.calculate(self.data, 32, 186))
+
+        self.assertTrue(png.startswith(b'\x89PNG\r\n\x1a\n'))
+        width, height = struct.unpack('>II', png[16:24])
+        self.assertEqual((width, height), (600, 1000))
+
+    def test_render_reuses_template(self):
+        first = plot.render(calc.calculate(self.data, 32, 186))
+        other = plot.render(calc.calculate(self.data, 25, 3000))
+        again = plot.render(calc.calculate(self.data, 32, 186))
+
+        self.assertNotEqual(first, other)
+        self.assertEqual(first, again)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+import httpcache
+import pngstore
+
+
+class TestPngStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = pngstore.DIRECTORY
+        self.max_bytes = pngstore.MAX_BYTES
+        pngstore.DIRECTORY = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(pngstore.DIRECTORY)
+        pngstore.DIRECTORY = self.directory
+        pngstore.MAX_BYTES = self.max_bytes
+
+    def test_put_get(self):
+        key = httpcache.key('uwyo-2018071012-abc', 'Megido', 186, 32)
+        self.assertIsNone(pngstore.get(key))
+        path = pngstore.put(key, b'png')
+        self.assertEqual(pngstore.get(key), path)
+        self.assertEqual(open(path, 'rb').read(), b'png')
+        self.assertEqual(os.listdir(pngstore.DIRECTORY), [key + '.png'])
+
+    def test_private(self):
+        # the served images can only be written by the app user
+        info = os.lstat(self.directory)
+        self.assertTrue(stat.S_ISDIR(info.st_mode))
+        self.assertEqual(info.st_uid, os.getuid())
+        self.assertEqual(info.st_mode & 0o077, 0)
+
+    def test_evict_least_recently_used(self):
+        pngstore.MAX_BYTES = 25
+        pngstore.put('a', b'0' * 10)
+        pngstore.put('b', b'0' * 10)
+        os.utime(pngstore.get('a'), (time.time() - 10, time.time() - 10))
+        pngstore.get('b')
+
+        pngstore.put('c', b'0' * 10)
+
+        self.assertIsNone(pngstore.get('a'))
+        self.assertIsNotNone(pngstore.get('b'))
+        self.assertIsNotNone(pngstore.get('c'))
+
+    def test_running_total(self):
+        pngstore.put('a', b'0' * 10)
+        pngstore.put('b', b'0' * 10)
+        self.assertEqual(pngstore._total[pngstore.DIRECTORY], 20)
+        # replacing an image counts only the difference
+        pngstore.put('a', b'0' * 5)
+        self.assertEqual(pngstore._total[pngstore.DIRECTORY], 15)
+
+        pngstore.MAX_BYTES = 20
+        os.utime(pngstore.get('a'), (time.time() - 10, time.time() - 10))
+        pngstore.put('c', b'0' * 10)
+        self.assertIsNone(pngstore.get('a'))
+        self.assertIsNotNone(pngstore.get('c'))
+        sizes = [os.path.getsize(os.path.join(pngstore.DIRECTORY, name)) for name in os.listdir(pngstore.DIRECTORY)]
+        self.assertEqual(pngstore._total[pngstore.DIRECTORY], sum(sizes))
+        self.assertLessEqual(sum(sizes), pngstore.MAX_BYTES * pngstore.EVICT_TO)
@@ -0,0 +1,54 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+import calc
+import prerender
+import sounding
+import uwyo
+
+
+class TestPrerender(unittest.TestCase):
+
+    def setUp(self):
+        profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+        # a profile of its own, so it is not in the runs of other tests
+        self.profile = sounding.SoundingProfile('test', datetime.now(), profile.levels)
+
+    def test_no_names(self):
+        temps = []
+        prerender.start(self.profile, temps.append, [])
+        run = prerender._runs[self.profile.key]
+        self.assertEqual(run.names, [])
+
+        deadline = time.time() + 10
+        while run.state != 'done' and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(run.state, 'done')
+        self.assertEqual((run.total, run.done, run.failed), (0, 0, 0))
+        self.assertEqual(temps, [])
+
+    def test_failed(self):
+        started = threading.Event()
+
+        def fail(*args):
+            # fails once the run was looked up
+            started.wait(10)
+            raise ValueError('calculate failed')
+
+        calculate_many = calc.calculate_many
+        calc.calculate_many = fail
+        try:
+            prerender.start(self.profile, lambda station: 30, ['Megido'])
+            run = prerender._runs[self.profile.key]
+            started.set()
+            deadline = time.time() + 10
+            while run.state != 'failed' and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            calc.calculate_many = calculate_many
+        self.assertEqual(run.state, 'failed')
+        self.assertIsNotNone(run.finished)
+        # the next publish of the sounding starts it again
+        self.assertNotIn(self.profile.key, prerender._runs)
@@ -0,0 +1,16 @@
+import unittest
+from datetime import datetime
+
+import refresh
+
+
+class TestRefresh(unittest.TestCase):
+
+    def test_due(self):
+        # 2018-07-10 13:20:00 UTC
+        now = (datetime(2018, 7, 10, 13, 20) - datetime(1970, 1, 1)).total_seconds()
+        hour = 60*60
+        self.assertEqual(refresh.due(3*hour, now=now), now - hour - 20*60)
+        self.assertEqual(refresh.due(12*hour, now=now), now - hour - 20*60)
+        self.assertEqual(refresh.due(12*hour, offset=2*hour, now=now), now - 11*hour - 20*60)
+        self.assertEqual(refresh.due(15*60, now=now), now - 5*60)
@@ -0,0 +1,46 @@
+import unittest
+from datetime import datetime
+
+from werkzeug import exceptions
+
+import calc
+import render
+import uwyo
+
+
+class TestRender(unittest.TestCase):
+
+    def setUp(self):
+        profile = uwyo._parse(open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+        self.data = calc.calculate(profile, 32, 186)
+
+    def test_png(self):
+        png = render.png('test-png', self.data)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertEqual(render._pending, {})
+
+    def test_queue_full(self):
+        max_queue = render.MAX_QUEUE
+        render.MAX_QUEUE = 0
+        try:
+            with self.assertRaises(render.RenderQueueFullException):
+                render.png('test-queue-full', self.data)
+        finally:
+            render.MAX_QUEUE = max_queue
+
+    def test_timeout(self):
+        timeout = render.TIMEOUT
+        render.TIMEOUT = 0
+        try:
+            with self.assertRaises(exceptions.GatewayTimeout):
+                render.png('test-timeout', self.data)
+        finally:
+            render.TIMEOUT = timeout
+        # the render that timed out is still in the queue, and a retry waits
+        # for it
+        self.assertIn('test-timeout', render._pending)
+        pending = render._pending['test-timeout']
+        png = render.png('test-timeout', self.data)
+        self.assertTrue(pending.ready())
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertEqual(render._pending, {})
@@ -0,0 +1,62 @@
+import pickle
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+import sounding
+
+
+class TestSounding(unittest.TestCase):
+
+    def test_resample(self):
+        height = np.array([3000., 100., 1000., np.nan, 20000.])
+        temp = np.array([10., 30., 25., 0., -40.])
+        levels = sounding.resample(height, temp, temp, temp, temp, temp)
+
+        self.assertEqual(levels.dtype, np.float32)
+        self.assertEqual(levels.shape, (len(sounding.FIELDS), len(sounding.HEIGHT)))
+        np.testing.assert_allclose(levels[1], np.interp(sounding.HEIGHT, [100., 1000., 3000., 20000.], [30., 25., 10., -40.]), rtol=1e-6)
+
+    def test_resample_missing_values(self):
+        height = np.array([0., 5000., 10000.])
+        dew = np.array([20., np.nan, 0.])
+        levels = sounding.resample(height, dew, dew, dew, dew, dew)
+        self.assertAlmostEqual(levels[2][sounding.HEIGHT == 5000][0], 10.)
+
+    def test_at(self):
+        values = sounding.HEIGHT * 2
+        np.testing.assert_allclose(sounding.at(values, [150, 4000, -500, 20000]), [300, 8000, 0, sounding.TOP * 2])
+
+    def test_profile(self):
+        levels = np.zeros((len(sounding.FIELDS), len(sounding.HEIGHT)))
+        levels[1] = 20
+        profile = sounding.SoundingProfile('uwyo', datetime(2018, 7, 10, 12), levels)
+
+        self.assertEqual(profile.T.dtype, np.float32)
+        self.assertEqual(profile.T[0], 20)
+        self.assertTrue(profile.key.startswith('uwyo-2018071012-'))
+        with self.assertRaises(AttributeError):
+            profile.time = None
+        with self.assertRaises(ValueError):
+            profile.T[0] = 0
+
+        copy = pickle.loads(pickle.dumps(profile))
+        self.assertEqual(copy, profile)
+        self.assertEqual(hash(copy), hash(profile))
+        self.assertEqual(copy.time, profile.time)
+
+        levels[1] = 21
+        self.assertNotEqual(sounding.SoundingProfile('uwyo', profile.time, levels), profile)
+
+    def test_interpolate(self):
+        levels = np.zeros((len(sounding.FIELDS), len(sounding.HEIGHT)))
+        before = sounding.SoundingProfile('noaa', datetime(2018, 7, 10, 12), levels)
+        levels[1] = 30
+        after = sounding.SoundingProfile('noaa', datetime(2018, 7, 10, 15), levels)
+
+        profile = sounding.interpolate(before, after, datetime(2018, 7, 10, 13))
+
+        self.assertEqual(profile.time, datetime(2018, 7, 10, 13))
+        np.testing.assert_allclose(profile.T, 10)
+        np.testing.assert_allclose(profile.p, 0)
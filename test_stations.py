@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from werkzeug import exceptions
+
+import stations
+
+
+class TestStations(unittest.TestCase):
+
+    def test_nearest(self):
+        megido = stations.get('Megido')['coord']
+        result = stations.nearest(megido['lat'], megido['long'], k=3)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result[0], ('Megido', 0.0))
+        distances = [distance for _, distance in result]
+        self.assertEqual(distances, sorted(distances))
+
+        self.assertEqual(len(stations.nearest(0, 0, k=1000)), len(stations.all()))
+        self.assertEqual(stations.nearest(0, 0, k=0), [])
+
+    def test_within(self):
+        megido = stations.get('Megido')['coord']
+        haifa = stations.get('Haifa')['coord']
+        # about 31 km between them
+        names = [name for name, _ in stations.within(megido['lat'], megido['long'], 35)]
+        self.assertIn('Haifa', names)
+        self.assertEqual(names[0], 'Megido')
+        names = [name for name, _ in stations.within(megido['lat'], megido['long'], 25)]
+        self.assertNotIn('Haifa', names)
+        self.assertEqual(stations.within(0, 0, 100), [])
+
+        distance = dict(stations.within(megido['lat'], megido['long'], 100))['Haifa']
+        self.assertEqual(stations.nearest(haifa['lat'], haifa['long'], k=len(stations.all()))[0][0], 'Haifa')
+        self.assertAlmostEqual(distance, 31, delta=1)
+
+
+class TestReload(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = stations.PATH, stations.DIRECTORY, stations.CHECK_PERIOD, stations._registry[0]
+        self.directory = tempfile.mkdtemp()
+        stations.PATH = os.path.join(self.directory, 'stations.yaml')
+        stations.DIRECTORY = tempfile.mkdtemp(dir=self.directory)
+        stations.CHECK_PERIOD = 0
+        shutil.copy(self.saved[0], stations.PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        stations.PATH, stations.DIRECTORY, stations.CHECK_PERIOD, stations._registry[0] = self.saved
+
+    def _write(self, text, mtime):
+        with open(stations.PATH, 'a') as f:
+            f.write(text)
+        os.utime(stations.PATH, (mtime, mtime))
+
+    def test_reload(self):
+        stations._registry[0] = None
+        megido = stations.get('Megido')
+        self.assertTrue(os.listdir(stations.DIRECTORY))
+
+        self._write('Test:\n  coord: {lat: 29.5, long: 34.9}\n  elevation: 10\n  temp_max_id: 1\n', time.time() + 10)
+        self.assertEqual(stations.get('Test')['elevation'], 10)
+        self.assertEqual(stations.nearest(29.5, 34.9)[0][0], 'Test')
+        self.assertEqual(stations.get('Megido'), megido)
+
+        # a broken edit keeps the loaded stations
+        self._write('Broken: [\n', time.time() + 20)
+        self.assertEqual(stations.get('Test')['elevation'], 10)
+
+    def test_snapshot(self):
+        stations._registry[0] = None
+        stations.get('Megido')
+
+        # a new worker loads the snapshot instead of the yaml
+        stations._registry[0] = None
+        with open(stations.PATH) as f:
+            text = f.read()
+        stat = os.stat(stations.PATH)
+        with open(stations.PATH, 'w') as f:
+            f.write(text.replace('elevation: 186', 'elevation: 999'))
+        os.utime(stations.PATH, (stat.st_atime, stat.st_mtime))
+        self.assertEqual(stations.get('Megido')['elevation'], 186)
+
+        # a snapshot of another schema is compiled again
+        stations._registry[0] = None
+        stations.SCHEMA, schema = stations.SCHEMA + 1, stations.SCHEMA
+        try:
+            self.assertEqual(stations.get('Megido')['elevation'], 999)
+        finally:
+            stations.SCHEMA = schema
+
+    def test_invalid_types(self):
+        stations._registry[0] = None
+        stations.get('Megido')
+
+        # an edit with a station of wrong field types is not swapped in
+        self._write('Test:\n  coord: {lat: north, long: 34.9}\n  elevation: 10\n  temp_max_id: 1\n', time.time() + 10)
+        with self.assertRaises(exceptions.NotFound):
+            stations.get('Test')
+        self.assertEqual(stations.get('Megido')['elevation'], 186)
+
+        with self.assertRaises(ValueError):
+            stations._check({'Test': {'coord': {'lat': 29.5, 'long': 34.9}, 'elevation': '10', 'temp_max_id': 1}})
+        with self.assertRaises(ValueError):
+            stations._check({'Test': {'coord': {'lat': 29.5, 'long': 34.9}, 'elevation': 10, 'temp_max_id': '1'}})
+        with self.assertRaises(ValueError):
+            stations._check({'Test': {'coord': {'lat': 129.5, 'long': 34.9}, 'elevation': 10, 'temp_max_id': 1}})
+
+    def test_missing_yaml(self):
+        stations._registry[0] = None
+        stations.get('Megido')
+        os.remove(stations.PATH)
+        self.assertEqual(stations.get('Megido')['elevation'], 186)
+
+    def test_invalid_snapshot(self):
+        stations._registry[0] = None
+        stations.get('Megido')
+        path = stations._snapshot_path()
+        with open(path) as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot['schema'], stations.SCHEMA)
+
+        # a snapshot with wrong field types is compiled again from the yaml
+        snapshot['stations']['Megido']['elevation'] = 'high'
+        with open(path, 'w') as f:
+            json.dump(snapshot, f)
+        stations._registry[0] = None
+        self.assertEqual(stations.get('Megido')['elevation'], 186)
@@ -0,0 +1,36 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from datetime import timedelta
+
+import archive
+import sounding
+import uwyo
+
+
+class TestUwyo(unittest.TestCase):
+
+    def setUp(self):
+        self.directory, self.url = archive.DIRECTORY, uwyo._URL
+        archive.DIRECTORY = tempfile.mkdtemp()
+        # nothing listens on the port, so UWYO is down
+        uwyo._URL = 'http://127.0.0.1:9/sounding?test={date:%Y%m%d%H%M%S%f}'
+        self.profile = uwyo._parse(
+            open('testdata/uwyo-40179-2018071012.html', 'rb').read(), datetime(2018, 7, 10, 12))
+
+    def tearDown(self):
+        shutil.rmtree(archive.DIRECTORY)
+        archive.DIRECTORY, uwyo._URL = self.directory, self.url
+
+    def test_down(self):
+        with self.assertRaises(uwyo.NoSoundingDataException):
+            uwyo.data()
+
+        # the archived sounding of the day before is served
+        yesterday = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=1)
+        time_ = yesterday.replace(hour=0)
+        archive.save_sounding(sounding.SoundingProfile('uwyo', time_, self.profile.levels), uwyo._STATION)
+        profile, data_time = uwyo.data()
+        self.assertEqual(data_time, time_)
+        self.assertEqual(profile.time, time_)
@@ -1,104 +1,132 @@
-import matplotlib
-matplotlib.use("Agg")
-
-from beaker import cache
 import logging
 from datetime import datetime
+from datetime import timedelta
 import requests
 from werkzeug import exceptions
-from io import StringIO
-import pandas as pd
-import bs4
-from metpy.units import units
-import metpy.calc as mpcalc
+
+import archive
+import caching
+import parse
+import sounding
 
 
 class NoSoundingDataException(Exception): pass
 
 
-CACHE = cache.CacheManager()
-_URL = 'http://weather.uwyo.edu/cgi-bin/sounding?region=mideast&TYPE=TEXT%3ALIST&YEAR={date.year}&MONTH={date.month}&FROM={date.day:02d}{date.hour:02d}&TO={date.day:02d}{date.hour:02d}&STNM=40179'
-_COL_NAMES = ['pressure', 'height', 'temperature', 'dewpoint', 'relh', 'mixr', 'direction', 'speed', 'thta', 'thte', 'thtv']
+_URL = 'http://weather.uwyo.edu/cgi-bin/sounding?region=mideast&TYPE=TEXT%3ALIST&YEAR={date.year}&MONTH={date.month}&FROM={date.day:02d}{date.hour:02d}&TO={date.day:02d}{date.hour:02d}&STNM={station}'
+_STATION = '40179'
+# the soundings are released at 00Z and 12Z, a few hours late, so UWYO is
+# polled until they are in
+POLL = 15*60
+# the time to wait for UWYO [sec], the refresh jobs run one after the other,
+# so a hung request must not hold the others
+TIMEOUT = 30
 _MIN_SOUNDING_LEN = 5
 
+# functions that are called with every new sounding that is fetched
+_subscribers = []
+
+
+def subscribe(fn):
+    _subscribers.append(fn)
+
 
 def data():
-    date = datetime.now()
-    date = date.replace(hour=12)
-
-    # first try noon measurements
-    url = _URL.format(date=date)
-    data = _uwyo_data_get(url)
-    if data is not None:
-        return data, date
-
-    # if no noon measurements available, return the midnight measurements
-    date = date.replace(hour=0)
-    url = _URL.format(date=date)
-    data = _uwyo_data_get(url)
-    if data is not None:
-        return data, date
+    now = datetime.now()
+    failed = False
+    for date in _release_times(now):
+        try:
+            data = _uwyo_data_get(_URL.format(date=date, station=_STATION), date)
+        except (exceptions.InternalServerError, requests.RequestException):
+            logging.exception('Failed getting the UWYO sounding of %s', date)
+            failed = True
+            continue
+        if data is not None:
+            return data, date
+
+    # when UWYO is down, the soundings of the day before are served from the
+    # archive
+    if failed:
+        for date in _release_times(now - timedelta(days=1), all_day=True):
+            data = archive.load_sounding('uwyo', _STATION, date)
+            if data is not None:
+                return data, date
 
     raise NoSoundingDataException()
 
 
-@CACHE.cache('uwyo-data', expire=60*60)
-def _uwyo_data_get(url):
-    logging.info('Collecting data from UWYO')
-    # get HTML sounding content
-    resp = requests.get(url)
-    if resp.status_code != 200:
-        logging.error('Got unexpected status from "weather.uwyo.edu: %d: %s', resp.status_code, resp.content)
-        raise exceptions.InternalServerError('Failed to get sounding data from "http://weather.uwyo.edu"')
+def modified(time):
+    # the time the sounding of time was fetched, for the http validators
+    return _uwyo_data_get.stored(_URL.format(date=time, station=_STATION), time)
 
-    # parse html sounding content
-    page = bs4.BeautifulSoup(resp.content, 'html.parser')
-    try:
-        pre = page.html.find('pre')
-    except AttributeError:
-        return None
 
-    if pre is None:
-        logging.error('Failed parsing sounding page: %s' % page)
-        raise exceptions.InternalServerError('Failed parsing sounding content')
+def refresh(since):
+    # polls for the soundings that data() looks for. released soundings are
+    # read from the archive, so only a missing sounding goes to UWYO.
+    for date in _release_times(datetime.now()):
+        _uwyo_data_get.refresh(since, _URL.format(date=date, station=_STATION), date)
 
-    table = pre.text
 
-    df = pd.read_fwf(StringIO(table), skiprows=5, usecols=[0, 1, 2, 3, 4, 6, 7], names=_COL_NAMES)
+def _release_times(now, all_day=False):
+    # first try noon measurements, and if they are not available yet, the
+    # midnight measurements
+    noon = now.replace(hour=12, minute=0, second=0, microsecond=0)
+    if noon <= now or all_day:
+        yield noon
+    yield noon.replace(hour=0)
 
-    df = df.dropna(
-        subset=('temperature', 'dewpoint', 'direction', 'speed'),
-        how='all').reset_index(drop=True)
 
-    if any((
-        len(df['height']) < _MIN_SOUNDING_LEN,
-        len(df['temperature']) < _MIN_SOUNDING_LEN,
-        len(df['pressure']) < _MIN_SOUNDING_LEN,
-        len(df['dewpoint']) < _MIN_SOUNDING_LEN,
-    )):
-        return None
+def observed(time):
+    # the sounding of any past time, from the archive or from UWYO. it is not
+    # cached and not published, it is used to backfill the history.
+    profile = archive.load_sounding('uwyo', _STATION, time)
+    if profile is not None:
+        return profile
+    return _download(_URL.format(date=time, station=_STATION), time)
 
-    d = Data(
-        h=df['height'].values * units.meter,
-        p=df['pressure'].values * units.hPa,
-        T=df['temperature'].values * units.degC,
-        Td=df['dewpoint'].values * units.degC,
-    )
-    d.h = d.h.to('feet')
-    d.wind_u, d.wind_v = mpcalc.get_wind_components(
-        df['speed'].values * units.knots,
-        df['direction'].values * units.degrees)
 
-    return d
+@caching.cache('uwyo-data', expire=60*60)
+def _uwyo_data_get(url, time):
+    # an observed sounding does not change once it is published
+    profile = archive.load_sounding('uwyo', _STATION, time)
+    if profile is not None:
+        return profile
 
+    return _publish(_download(url, time))
 
-class Data:
 
-    def __init__(self, h, p, T, Td):
-        self.h = h
-        self.p = p
-        self.T = T
-        self.Td = Td
-        self.wind_u = None
-        self.wind_v = None
+def _download(url, time):
+    logging.info('Collecting data from UWYO for %s', time)
+    # get HTML sounding content
+    resp = requests.get(url, timeout=TIMEOUT)
+    if resp.status_code != 200:
+        logging.error('Got unexpected status from "weather.uwyo.edu: %d: %s', resp.status_code, resp.content)
+        raise exceptions.InternalServerError('Failed to get sounding data from "http://weather.uwyo.edu"')
+
+    profile = _parse(resp.content, time)
+    if profile is not None:
+        archive.save_sounding(profile, _STATION)
+    return profile
+
+
+def _publish(profile):
+    if profile is None:
+        return None
+    for fn in _subscribers:
+        try:
+            fn(profile)
+        except Exception:
+            logging.exception('Failed notifying about new UWYO sounding')
+    return profile
+
+
+def _parse(content, time):
+    columns = parse.uwyo(content)
+    if columns is None:
+        logging.warning('No sounding table in UWYO page for %s', time)
+        return None
+
+    if len(columns['height']) < _MIN_SOUNDING_LEN:
+        return None
 
+    return sounding.from_columns('uwyo', time, columns)